@@ -1,6 +1,7 @@
 import pygame
 import environment 
 import graph
+import render
 import argparse
 import sys
 
@@ -37,23 +38,17 @@ x_goal = tuple(args.x_goal) if args.x_goal is not None else (540, 380)
 # Instantiating the environment and the graph
 environment_ = environment.Environment(map_dimensions=MAP_DIMENSIONS)
 graph_ = graph.Graph(start=x_init, goal=x_goal, map_dimensions=MAP_DIMENSIONS, radius=args.radius)
+renderer = render.Renderer(environment=environment_, graph=graph_)
 
 def main():
 	run = True
 	clock = pygame.time.Clock()
-	configurations = []
-	nears = []
-	success_configurations = []
-	success_nears = []
-	initial = graph_.draw_initial_node(map_=environment_.map)
-	goal = graph_.draw_goal_node(map_=environment_.map)
-	configurations.append(initial)
-	configurations.append(goal)
+	configurations = [x_init, x_goal]
+	renderer.draw_initial_node()
+	renderer.draw_goal_node()
 	environment_.make_obstacles()
-	obstacles = environment_.draw_obstacles() if args.obstacles else []
-	graph_.obstacles = obstacles
+	graph_.obstacles = environment_.obstacle_rects() if args.obstacles else []
 	is_simulation_finished = False
-	is_configuration_free = True
 
 	# Number of nodes to put in the roadmap
 	n = 0
@@ -62,59 +57,38 @@ def main():
 	k = args.k_nearest if args.k_nearest is not None else 15 
 
 	while run:
-		clock.tick(environment_.FPS) 
+		clock.tick(renderer.FPS) 
 		for event in pygame.event.get():
 			if event.type == pygame.QUIT:
 				run = False
 
-		obstacles = environment_.draw_obstacles() if args.obstacles else []
+		if args.obstacles:
+			renderer.draw_obstacles()
 		x_rand = graph_.generate_random_node()
-		collision_free = graph_.is_free(point=x_rand, obstacles=obstacles)
+		collision_free = graph_.is_free(point=x_rand, obstacles=graph_.obstacles)
 		sampling = n < args.nodes # Sampling time
 
 		if collision_free and sampling:
 			if args.show_random_nodes:
-				graph_.draw_random_node(map_=environment_.map)
+				renderer.draw_random_node(x_rand)
 
 			configurations.append(x_rand)
 			n += 1 # Counter for the maximum allowed nodes		
 
 		if not sampling and not is_simulation_finished:
-			for configuration in configurations:
-				# Remove the current configuration 
-				new_configurations = configurations.copy()
-				new_configurations.remove(configuration)
-				near = graph_.k_nearest(graph=new_configurations, # k-nearest
-					x_rand=configuration, configuration=configuration, k=k)
-
-				for i in range(k):
-					cross_obstacle = graph_.cross_obstacle(configuration1=configuration,
-						configuration2=near[i], map_=environment_.map)
-					
-					if not cross_obstacle:
-						graph_.draw_local_planner(p1=configuration, p2=near[i],
-							map_=environment_.map)
-						nears.append(near[i])
-
-						if is_configuration_free: 
-							success_configurations.append(configuration)
-							is_configuration_free = False
-
-				if nears != []:
-					success_nears.append(nears)
-					nears = []			
-				is_configuration_free = True
-
-			graph_.a_star(nodes=configurations, map_=environment_.map)
+			# k-nearest of every configuration and the free edges between them
+			roadmap = graph_.build_roadmap(configurations=configurations, k=k)
+
+			for p1, p2 in roadmap.segments().tolist():
+				renderer.draw_local_planner(p1=p1, p2=p2)
+
+			graph_.a_star(nodes=configurations)
 			is_simulation_finished = True
 
 		if is_simulation_finished:
-			graph_.draw_roadmap(configurations=success_configurations, nears=success_nears, 
-				map_=environment_.map, k=k)
-			graph_.draw_trajectory(configurations=success_configurations, nears=success_nears, 
-				environment=environment_, obstacles=obstacles, k=k, keep_roadmap=args.keep_roadmap)
-			graph_.draw_path_to_goal(map_=environment_.map, environment=environment_,
-				 obstacles=obstacles)
+			renderer.draw_roadmap()
+			renderer.draw_trajectory(keep_roadmap=args.keep_roadmap)
+			renderer.draw_path_to_goal()
 
 		pygame.display.update()
 
@@ -5,27 +5,79 @@
 import argparse
 import numpy as np
 import matplotlib.pyplot as plt
-import pickle
 import pandas
 
-from config import SAMPLERS
+import results_store
+from config import SAMPLERS, SUCCESS_VERDICTS, DETERMINISTIC_SAMPLERS
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--nodes', type=int, default=100, help='Number of nodes in PRM roadmap')
 parser.add_argument('--level', type=int, default=1, help='Difficulty level of the environment')
 parser.add_argument('--reps', type=int, default=10, help='Number of repetitions for each sampler')
+parser.add_argument('--radius', type=int, help='Robot radius of the runs, all of them by default')
+parser.add_argument('--k', type=int, default=15, help='Number of the closest neighbors of the knn runs')
+parser.add_argument('--seed', type=int,
+                    help='Root seed of the runs, -1 for unseeded ones, the last one run for each sampler by default')
+# Planner options of the runs, as given to prm_vs_samplers
+parser.add_argument('--obstacles', action=argparse.BooleanOptionalAction, default=True,
+                    help='Runs with the obstacles on the map')
+parser.add_argument('--connection', type=str, choices=['knn', 'radius', 'prm_star'], default='knn',
+                    help='Connection of the nodes of the runs')
+parser.add_argument('--connection_radius', type=float, default=50, help='Connection radius of the radius runs')
+parser.add_argument('--gamma', type=float,
+                    help='Scale of the PRM* radius of the prm_star runs, the default one if not given')
+parser.add_argument('--collision', type=str, choices=['analytic', 'bitmap'], default='analytic',
+                    help='Collision checks of the runs')
+parser.add_argument('--search', type=str, choices=['astar', 'csgraph'], default='astar', help='Search of the runs')
+parser.add_argument('--lazy', action=argparse.BooleanOptionalAction, default=False, help='Lazy runs')
+parser.add_argument('--early_exit', action=argparse.BooleanOptionalAction, default=False, help='Early exit runs')
+parser.add_argument('--multi_query', action=argparse.BooleanOptionalAction, default=False, help='Multi-query runs')
+parser.add_argument('--prefix', dest='prefix_nodes', action='store_true', help='Runs of the incremental prefix passes')
 # if the plot flag is entered in the command line, the results will be plotted
 parser.add_argument('--plot', action='store_true', help='Plot the results')
 args = parser.parse_args()
 
+def load_results(nodes, reps, plot):
+    # Results of every sampler read from the store, only the paths of the
+    # plots are read back
+    columns = ['sampler', 'rep', 'seed', 'verdict', 'success', 'length', 'cardinality'] + (['path'] if plot else [])
+    where = {'level': args.level, 'nodes': nodes, 'k': args.k, **results_store.run_options(args)}
+    if args.radius is not None:
+        where['radius'] = args.radius
+    if args.seed is not None:
+        where['seed'] = args.seed
+    rows = results_store.store.read(columns, **where)
+
+    results = {}
+    for distribution in SAMPLERS:
+        mask = (rows['sampler'] == distribution) & (rows['rep'] < reps)
+        if not mask.any():
+            continue
+        # Reps of different seeds are different runs, only the last seed run is kept
+        seeds = rows['seed'][mask]
+        if len(set(seeds.tolist())) > 1:
+            print(f'{distribution} was run with the seeds {sorted(set(seeds.tolist()))}, '
+                  f'analysing seed {seeds[-1]}, see --seed')
+        mask &= rows['seed'] == seeds[-1]
+        # The first rep without points is the number of batches of the sampler
+        exhausted = mask & (rows['verdict'] == 'exhausted')
+        mask &= ~exhausted
+        lengths = rows['length'][mask]
+        results[distribution] = {'lengths': lengths[~np.isnan(lengths)],
+                                 'cardinality': rows['cardinality'][mask & rows['success']],
+                                 'verdict': rows['verdict'][mask].tolist(),
+                                 'batch_size': rows['rep'][exhausted].tolist()}
+        if plot:
+            results[distribution]['paths'] = [path.tolist() for path, keep in zip(rows['path'], mask)
+                                              if keep and len(path)]
+    return results
+
 def analyse(nodes, reps, plot=True):
-    # Load results from file
-    file = "results/results_" + str(nodes) + "_" + str(reps) + "_" + str(args.level) + ".npy"
-    print(f'Loading results from {file}')
-    try:
-        results = np.load(file, allow_pickle=True).item()
-    except:
-        print('Results file not found. Please run the PRM sampler comparison script first.')
+    # Load results from the store
+    print(f'Loading results of {nodes} nodes at level {args.level} from {results_store.store.root}')
+    results = load_results(nodes, reps, plot)
+    if not results:
+        print('No results found. Please run the PRM sampler comparison script first.')
         return
 
     # Print results and save them to a csv file
@@ -35,9 +87,9 @@ def analyse(nodes, reps, plot=True):
     # header specifying the number of nodes
     print(f'\n Analyzing results for {nodes} nodes and {reps} reps')
     for distribution, data in results.items():
-        if distribution in ['mpmc_batch', 'mpmc_l2bat']:
-            reps = results[distribution]['batch_size'][0]
-        elif distribution in ["mpmc", "mpmc_seq", "sobol_unscr", "halton_unscr"]:
+        if distribution in ['mpmc_batch', 'mpmc_l2bat'] and data['batch_size']:
+            reps = min(data['batch_size'])
+        elif distribution in DETERMINISTIC_SAMPLERS:
             reps = 1 
         else:
             reps = args.reps
@@ -58,7 +110,11 @@ def analyse(nodes, reps, plot=True):
         res[distribution]['percentage_gain'] = gain
 
 
-        misses = reps - len(data['lengths'])
+        # Early exits reach the goal without a path length, count the successes
+        # from the verdicts
+        verdicts = data['verdict']
+        successes = sum(verdict in SUCCESS_VERDICTS for verdict in verdicts)
+        misses = reps - successes
         print(f'  Misses: {misses}')
         # miss percentage
         res[distribution]['miss_percentage'] = misses / (reps) * 100
@@ -66,6 +122,7 @@ def analyse(nodes, reps, plot=True):
         print(f'reps: {reps}')
 
         res[distribution]['misses'] = misses
+        res[distribution]['disconnected'] = verdicts.count('disconnected')
 
     # save results to csv file
     df = pandas.DataFrame(res)
@@ -0,0 +1,489 @@
+# Vectorized collision checks between the square robot footprint and the
+# axis-aligned rectangle obstacles of the map.
+
+import hashlib
+
+import numpy as np
+
+# Upper bound on the number of (edge, obstacle) pairs evaluated at once
+CHUNK_PAIRS = 1 << 20
+
+
+def rects_to_array(rects):
+    '''
+    Converts a collection of rectangles to an array of bounds.
+
+    Parameters
+    ----------
+    rects : list
+        pygame.Rect obstacles, or (left, top, width, height) tuples.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (m, 4) holding left, top, right and bottom of
+        every rectangle.
+    '''
+    boxes = np.array([(rect[0], rect[1], rect[0] + rect[2], rect[1] + rect[3]) for rect in rects],
+                     dtype=np.float64)
+    return boxes.reshape(-1, 4)
+
+
+def inflate(boxes, radius):
+    '''
+    Grows every box by the robot radius on each side.
+
+    A robot square of side 2*radius centered at (x, y) overlaps an obstacle
+    exactly when (x, y) lies strictly inside the inflated box.
+    '''
+    return boxes + np.array([-radius, -radius, radius, radius], dtype=np.float64)
+
+
+def points_collide(points, boxes, radius):
+    '''
+    Checks a batch of robot centers against every obstacle.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Robot centers of shape (n, 2).
+    boxes : numpy.ndarray
+        Obstacle bounds of shape (m, 4), see rects_to_array.
+    radius : int
+        Robot radius.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array of shape (n,), True where the robot overlaps an obstacle.
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    inflated = inflate(boxes, radius)
+    x = points[:, 0, None]
+    y = points[:, 1, None]
+    inside = (inflated[:, 0] < x) & (x < inflated[:, 2]) & (inflated[:, 1] < y) & (y < inflated[:, 3])
+    return inside.any(axis=1)
+
+
+def _slab(start, delta, low, high):
+    '''Open interval of the segment parameter where start + t*delta lies in (low, high).'''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (low - start) / delta
+        t2 = (high - start) / delta
+    enter = np.minimum(t1, t2)
+    leave = np.maximum(t1, t2)
+
+    # Segments parallel to the slab are either always or never inside it
+    parallel = delta == 0
+    inside = (low < start) & (start < high)
+    enter = np.where(parallel, np.where(inside, -np.inf, np.inf), enter)
+    leave = np.where(parallel, np.where(inside, np.inf, -np.inf), leave)
+    return enter, leave
+
+
+def segment_box_pairs_collide(starts, ends, inflated):
+    '''
+    Exact test of segments against open boxes, evaluated pairwise.
+
+    All arguments broadcast against each other, so (e, 1, 2) segments and
+    (m, 4) boxes give an (e, m) result.
+    '''
+    delta = ends - starts
+    enter_x, leave_x = _slab(starts[..., 0], delta[..., 0], inflated[..., 0], inflated[..., 2])
+    enter_y, leave_y = _slab(starts[..., 1], delta[..., 1], inflated[..., 1], inflated[..., 3])
+    enter = np.maximum(enter_x, enter_y)
+    leave = np.minimum(leave_x, leave_y)
+    return (enter < leave) & (enter < 1) & (leave > 0)
+
+
+def segments_collide(starts, ends, boxes, radius):
+    '''
+    Checks a batch of straight-line robot motions against every obstacle.
+
+    The robot square is swept along each segment and tested analytically
+    against every obstacle grown by the robot radius. Every position that
+    the sampled check of Graph.cross_obstacle can produce lies on the swept
+    segment, so the answer is the same or strictly more conservative.
+
+    Parameters
+    ----------
+    starts : numpy.ndarray
+        Segment start points of shape (e, 2).
+    ends : numpy.ndarray
+        Segment end points of shape (e, 2).
+    boxes : numpy.ndarray
+        Obstacle bounds of shape (m, 4), see rects_to_array.
+    radius : int
+        Robot radius.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array of shape (e,), True where the motion hits an obstacle.
+    '''
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+    collide = np.zeros(len(starts), dtype=bool)
+    if len(boxes) == 0:
+        return collide
+
+    inflated = inflate(boxes, radius)
+    step = max(1, CHUNK_PAIRS // len(inflated))
+    for i in range(0, len(starts), step):
+        hits = segment_box_pairs_collide(starts[i:i + step, None], ends[i:i + step, None], inflated)
+        collide[i:i + step] = hits.any(axis=1)
+    return collide
+
+
+def _expand_ranges(ranges):
+    '''
+    Enumerates the cells covered by rectangular cell ranges.
+
+    Parameters
+    ----------
+    ranges : numpy.ndarray
+        Integer array of shape (q, 4) with first and last cell column and
+        row (x0, y0, x1, y1) of every range, inclusive.
+
+    Returns
+    -------
+    tuple
+        Owner range, cell column and cell row of every enumerated cell.
+    '''
+    nx = ranges[:, 2] - ranges[:, 0] + 1
+    ny = ranges[:, 3] - ranges[:, 1] + 1
+    counts = nx * ny
+    owner = np.repeat(np.arange(len(ranges)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = ranges[owner, 0] + local % nx[owner]
+    cy = ranges[owner, 1] + local // nx[owner]
+    return owner, cx, cy
+
+
+class ObstacleGrid:
+    '''
+    A uniform bucket grid over the obstacles grown by the robot radius.
+
+    Every inflated obstacle is registered in all the cells its bounds
+    overlap, so node and edge queries only test the obstacles sharing a
+    cell with the query bounding box.
+
+    Attributes
+    ----------
+    boxes : numpy.ndarray
+        Obstacle bounds of shape (m, 4), see rects_to_array.
+    radius : int
+        Robot radius.
+    map_dimensions : tuple
+        Map width and height in pixels.
+    cell_size : int
+        Side of the square grid cells in pixels.
+    '''
+
+    def __init__(self, boxes, radius, map_dimensions, cell_size=32):
+        self.inflated = inflate(boxes, radius)
+        self.cell_size = cell_size
+        width, height = map_dimensions
+        self.nx = max(1, int(np.ceil(width / cell_size)))
+        self.ny = max(1, int(np.ceil(height / cell_size)))
+
+        # Cell ranges of every obstacle, then bucket them by cell id
+        self.box_cells = self.cell_ranges(self.inflated[:, :2], self.inflated[:, 2:])
+        owner, cx, cy = _expand_ranges(self.box_cells)
+        cells = cy * self.nx + cx
+        order = np.argsort(cells, kind='stable')
+        self.items = owner[order]
+        self.indptr = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.nx * self.ny), out=self.indptr[1:])
+
+    def cell_ranges(self, low, high):
+        '''Inclusive cell ranges (x0, y0, x1, y1) covering the given bounds.'''
+        low = np.floor(np.asarray(low, dtype=np.float64) / self.cell_size).astype(np.int64)
+        high = np.floor(np.asarray(high, dtype=np.float64) / self.cell_size).astype(np.int64)
+        limit = np.array([self.nx - 1, self.ny - 1])
+        low = np.clip(low, 0, limit)
+        high = np.clip(high, 0, limit)
+        return np.concatenate([low, high], axis=-1).reshape(-1, 4)
+
+    def _candidates(self, ranges):
+        '''(query, obstacle) pairs sharing a cell, each pair reported once.'''
+        owner, cx, cy = _expand_ranges(ranges)
+        cells = cy * self.nx + cx
+        counts = self.indptr[cells + 1] - self.indptr[cells]
+        query = np.repeat(owner, counts)
+        first = np.repeat(self.indptr[cells] - (np.cumsum(counts) - counts), counts)
+        box = self.items[np.arange(counts.sum()) + first]
+
+        # A pair overlapping several cells is only kept in its lowest shared cell
+        keep = (np.repeat(cx, counts) == np.maximum(self.box_cells[box, 0], ranges[query, 0])) & \
+            (np.repeat(cy, counts) == np.maximum(self.box_cells[box, 1], ranges[query, 1]))
+        return query[keep], box[keep]
+
+    def points_collide(self, points):
+        '''
+        Checks a batch of robot centers against the nearby obstacles.
+
+        Parameters
+        ----------
+        points : numpy.ndarray
+            Robot centers of shape (n, 2).
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array of shape (n,), True where the robot overlaps an obstacle.
+        '''
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        query, box = self._candidates(self.cell_ranges(points, points))
+        x, y = points[query, 0], points[query, 1]
+        bounds = self.inflated[box]
+        inside = (bounds[:, 0] < x) & (x < bounds[:, 2]) & (bounds[:, 1] < y) & (y < bounds[:, 3])
+        collide = np.zeros(len(points), dtype=bool)
+        collide[query[inside]] = True
+        return collide
+
+    def segments_collide(self, starts, ends):
+        '''
+        Checks a batch of straight-line robot motions against the nearby obstacles.
+
+        Same answers as segments_collide, only obstacles whose cells overlap
+        the bounding box of a segment are tested against it.
+
+        Parameters
+        ----------
+        starts : numpy.ndarray
+            Segment start points of shape (e, 2).
+        ends : numpy.ndarray
+            Segment end points of shape (e, 2).
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array of shape (e,), True where the motion hits an obstacle.
+        '''
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        collide = np.zeros(len(starts), dtype=bool)
+        step = max(1, CHUNK_PAIRS // 256)
+        for i in range(0, len(starts), step):
+            a, b = starts[i:i + step], ends[i:i + step]
+            query, box = self._candidates(self.cell_ranges(np.minimum(a, b), np.maximum(a, b)))
+            hits = segment_box_pairs_collide(a[query], b[query], self.inflated[box])
+            collide[i + query[hits]] = True
+        return collide
+
+
+class OccupancyBitmap:
+    '''
+    Configuration space occupancy of the map at pixel resolution.
+
+    Pixel (x, y) is set when the robot centered there overlaps an obstacle,
+    so nodes at integer centers are checked with a single lookup, and the
+    pixels are stored packed eight to a byte. Edges are walked column by
+    column over the unit cells covered by the grown obstacles: the cells a
+    segment crosses within a column are looked up at once through
+    per-column prefix sums. For integer end points and obstacle bounds a
+    segment crosses the inside of such a cell exactly when it enters the
+    grown obstacle, so the answers are the ones of segments_collide. Axis
+    parallel segments, and points and segments leaving the bitmap margin,
+    fall back to the exact tests.
+
+    Attributes
+    ----------
+    boxes : numpy.ndarray
+        Obstacle bounds of shape (m, 4), see rects_to_array.
+    radius : int
+        Robot radius.
+    map_dimensions : tuple
+        Map width and height in pixels.
+    '''
+
+    # Pixels around the map covered by the bitmap
+    MARGIN = 2
+
+    def __init__(self, boxes, radius, map_dimensions):
+        self.boxes = boxes
+        self.radius = radius
+        width, height = map_dimensions
+        self.shape = (height + 2 * self.MARGIN, width + 2 * self.MARGIN)
+
+        pixels = np.zeros(self.shape, dtype=bool)
+        cells = np.zeros(self.shape, dtype=bool)
+        for left, top, right, bottom in inflate(boxes, radius) + self.MARGIN:
+            x0, y0 = int(np.floor(left)), int(np.floor(top))
+            x1, y1 = max(0, int(np.ceil(right))), max(0, int(np.ceil(bottom)))
+            # Integer centers strictly inside the grown obstacle
+            pixels[max(0, y0 + 1):y1, max(0, x0 + 1):x1] = True
+            # Unit cells [x, x+1] x [y, y+1] covered by the grown obstacle
+            cells[max(0, y0):y1, max(0, x0):x1] = True
+
+        self.bits = np.packbits(pixels, axis=1)
+        # Occupied cells above every cell of a column, and left of every cell of a row
+        self.column_sums = np.zeros((self.shape[0] + 1, self.shape[1]), dtype=np.int32)
+        np.cumsum(cells, axis=0, out=self.column_sums[1:])
+        self.row_sums = np.zeros((self.shape[1] + 1, self.shape[0]), dtype=np.int32)
+        np.cumsum(cells.T, axis=0, out=self.row_sums[1:])
+        # Occupied cells above and left of every cell, to skip segments in open space
+        self.area_sums = np.zeros((self.shape[0] + 1, self.shape[1] + 1), dtype=np.int32)
+        np.cumsum(self.column_sums[1:], axis=1, out=self.area_sums[1:, 1:])
+
+    @property
+    def nbytes(self):
+        '''Memory used by the bitmap arrays in bytes.'''
+        return self.bits.nbytes + self.column_sums.nbytes + self.row_sums.nbytes + self.area_sums.nbytes
+
+    def points_collide(self, points):
+        '''
+        Checks a batch of robot centers against the bitmap.
+
+        Parameters
+        ----------
+        points : numpy.ndarray
+            Robot centers of shape (n, 2).
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array of shape (n,), True where the robot overlaps an obstacle.
+        '''
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        shifted = points + self.MARGIN
+        inside = (points == np.round(points)).all(axis=1) & (shifted >= 0).all(axis=1) & \
+            (shifted[:, 0] < self.shape[1]) & (shifted[:, 1] < self.shape[0])
+
+        collide = np.empty(len(points), dtype=bool)
+        x, y = shifted[inside].astype(np.int64).T
+        collide[inside] = (self.bits[y, x >> 3] >> (7 - (x & 7))) & 1
+        collide[~inside] = points_collide(points[~inside], self.boxes, self.radius)
+        return collide
+
+    def segments_collide(self, starts, ends):
+        '''
+        Checks a batch of straight-line robot motions against the bitmap.
+
+        Parameters
+        ----------
+        starts : numpy.ndarray
+            Segment start points of shape (e, 2).
+        ends : numpy.ndarray
+            Segment end points of shape (e, 2).
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array of shape (e,), True where the motion hits an obstacle.
+        '''
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2) + self.MARGIN
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2) + self.MARGIN
+        low = np.minimum(starts, ends)
+        high = np.maximum(starts, ends)
+        # The cells crossed by segments in the inner area all lie in the bitmap, axis
+        # parallel segments run along cell borders and are checked exactly
+        inside = (low >= 0).all(axis=1) & (high[:, 0] <= self.shape[1]) & (high[:, 1] <= self.shape[0]) & \
+            (low < high).all(axis=1)
+
+        collide = np.zeros(len(starts), dtype=bool)
+        collide[~inside] = segments_collide(starts[~inside] - self.MARGIN, ends[~inside] - self.MARGIN,
+                                            self.boxes, self.radius)
+
+        # Segments whose bounding box holds no occupied cell are free
+        first = np.floor(low[inside]).astype(np.int64)
+        last = np.ceil(high[inside]).astype(np.int64)
+        occupied = self.area_sums[last[:, 1], last[:, 0]] - self.area_sums[first[:, 1], last[:, 0]] - \
+            self.area_sums[last[:, 1], first[:, 0]] + self.area_sums[first[:, 1], first[:, 0]]
+        inside[inside] = occupied > 0
+
+        # Mostly horizontal segments are walked row by row, as the transposed problem
+        span = high - low
+        by_rows = span[:, 0] > span[:, 1]
+        step = max(1, CHUNK_PAIRS // 64)
+        for walk_rows, sums in ((False, self.column_sums), (True, self.row_sums)):
+            index = np.flatnonzero(inside & (by_rows == walk_rows))
+            axes = [1, 0] if walk_rows else [0, 1]
+            for i in range(0, len(index), step):
+                edges = index[i:i + step]
+                collide[edges] = self._walk(starts[edges][:, axes], ends[edges][:, axes], sums)
+        return collide
+
+    @staticmethod
+    def _walk(starts, ends, sums):
+        '''Looks up the cells crossed by every segment, one column of cells at a time.'''
+        x_low = np.minimum(starts[:, 0], ends[:, 0])
+        x_high = np.maximum(starts[:, 0], ends[:, 0])
+
+        # Columns of cells whose interior the segment crosses
+        first = np.floor(x_low).astype(np.int64)
+        counts = np.ceil(x_high).astype(np.int64) - first
+        owner = np.repeat(np.arange(len(starts)), counts)
+        column = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + first[owner]
+
+        # Part of the segment within the column and the rows it crosses. The
+        # division comes last, so integer crossings are exact for integer end points
+        x0, y0 = starts[owner, 0], starts[owner, 1]
+        dx, dy = ends[owner, 0] - x0, ends[owner, 1] - y0
+        v0 = y0 + (np.maximum(column, x_low[owner]) - x0) * dy / dx
+        v1 = y0 + (np.minimum(column + 1, x_high[owner]) - x0) * dy / dx
+        row_low = np.floor(np.minimum(v0, v1)).astype(np.int64)
+        row_high = np.ceil(np.maximum(v0, v1)).astype(np.int64)
+
+        blocked = sums[row_high, column] > sums[row_low, column]
+        collide = np.zeros(len(starts), dtype=bool)
+        collide[owner[blocked]] = True
+        return collide
+
+
+# Obstacle grids and occupancy bitmaps already built, shared by every graph
+# with the same obstacles, robot radius and map dimensions
+_grids = {}
+_bitmaps = {}
+
+
+def _cache_key(boxes, radius, map_dimensions):
+    boxes = np.ascontiguousarray(boxes, dtype=np.float64)
+    return hashlib.sha1(boxes.tobytes()).hexdigest(), radius, tuple(map_dimensions)
+
+
+def obstacle_grid(boxes, radius, map_dimensions):
+    '''
+    Spatial index of the given obstacles, built once and then shared.
+
+    Parameters
+    ----------
+    boxes : numpy.ndarray
+        Obstacle bounds of shape (m, 4), see rects_to_array.
+    radius : int
+        Robot radius.
+    map_dimensions : tuple
+        Map width and height in pixels.
+
+    Returns
+    -------
+    ObstacleGrid
+    '''
+    key = _cache_key(boxes, radius, map_dimensions)
+    if key not in _grids:
+        _grids[key] = ObstacleGrid(np.asarray(boxes, dtype=np.float64), radius, map_dimensions)
+    return _grids[key]
+
+
+def occupancy_bitmap(boxes, radius, map_dimensions):
+    '''
+    Occupancy bitmap of the given obstacles, built once and then shared.
+
+    Parameters
+    ----------
+    boxes : numpy.ndarray
+        Obstacle bounds of shape (m, 4), see rects_to_array.
+    radius : int
+        Robot radius.
+    map_dimensions : tuple
+        Map width and height in pixels.
+
+    Returns
+    -------
+    OccupancyBitmap
+    '''
+    key = _cache_key(boxes, radius, map_dimensions)
+    if key not in _bitmaps:
+        _bitmaps[key] = OccupancyBitmap(np.asarray(boxes, dtype=np.float64), radius, map_dimensions)
+    return _bitmaps[key]
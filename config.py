@@ -2,6 +2,19 @@ SAMPLERS = ["uniform", "sobol_scram", "sobol_unscr", "sobol_batch", "sobol_rand"
             "halton_batch", "halton_rand", "tri_lat", "tri_lat_add", "sukharev", "sukharev_add", "mpmc",
             "mpmc_rand", "mpmc_seq", "mpmc_batch", "mpmc_l2bat"]
 
+# Deterministic sequences whose smaller point sets are prefixes of the larger ones
+PREFIX_SAMPLERS = ["mpmc_seq", "sobol_unscr", "halton_unscr"]
+
+# Samplers whose point set is the same at every rep, they are run once
+DETERMINISTIC_SAMPLERS = ["mpmc", "mpmc_seq", "sobol_unscr", "halton_unscr"]
+
+# Samplers drawn from the MPMC point set files, and the node counts they exist for
+MPMC_SAMPLERS = ["mpmc", "mpmc_rand", "mpmc_batch", "mpmc_l2bat"]
+MPMC_NODES = [32, 64, 128, 256, 512, 1024]
+
+# Graph.verdict values of the runs that reached the goal
+SUCCESS_VERDICTS = ["path", "connected"]
+
 # Constants
 MAP_DIMENSIONS = 640, 480
 
@@ -1,13 +1,25 @@
-import pygame
-import os
 import numpy as np
 
 from config import MAP_DIMENSIONS, POSI, INIT, INITIAL
 
+
+def rect(left, top, width, height):
+    '''
+    Rectangle as a (left, top, width, height) tuple of ints.
+
+    The values are truncated like pygame.Rect does, so the obstacles are
+    the same with or without pygame.
+    '''
+    return int(left), int(top), int(width), int(height)
+
+
 class Environment:
     '''
     A class of the map where the robot will be moving around.
 
+    The map only holds the obstacle geometry, it is drawn by the optional
+    render module.
+
     Attributes
     ----------
     dimensions : tuple
@@ -15,21 +27,7 @@ class Environment:
     '''
     
     def __init__(self, map_dimensions, level = (1,)):
-        self.WHITE = (255, 255, 255)
-        self.BLACK = (0, 0, 0)
-        self.RED = (255, 0, 0)
-        self.GREEN = (0, 255, 0)
-        self.BLUE = (0, 0, 255)
-        self.BROWN = (189, 154, 122)
-        self.YELLOW = (255, 255, 0)
-        self.ORANGE = (255, 165, 0)
-        self.PURPLE = (128, 0, 128)
-        self.GRAY = (105, 105, 105)
         (self.WIDTH, self.HEIGHT) = map_dimensions
-        self.FPS = 120
-        pygame.display.set_caption('PRM')
-        self.map = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
-        self.map.fill(self.WHITE)
         self.level = level
         self.obstacles = []
 
@@ -51,8 +49,8 @@ class Environment:
         '''
         x = initial_point[0]
         y = initial_point[1]
-        side1 = pygame.Rect(x, y, height, width)
-        side2 = pygame.Rect(x + height // 2 - width // 2, y, width, height)
+        side1 = rect(x, y, height, width)
+        side2 = rect(x + height // 2 - width // 2, y, width, height)
         obstacle = [
             side1,
             side2]
@@ -76,8 +74,8 @@ class Environment:
         '''
         x = initial_point[0]
         y = initial_point[1]
-        side1 = pygame.Rect(x, y, width, height)
-        side2 = pygame.Rect(x, y + height - width, height, width)
+        side1 = rect(x, y, width, height)
+        side2 = rect(x, y + height - width, height, width)
         obstacle = [
             side1,
             side2]
@@ -101,7 +99,7 @@ class Environment:
         '''
         x = initial_point[0]
         y = initial_point[1]
-        side1 = pygame.Rect(x, y, width, height)
+        side1 = rect(x, y, width, height)
         obstacle = [
             side1]
         return obstacle
@@ -124,10 +122,10 @@ class Environment:
         '''
         x = initial_point[0]
         y = initial_point[1]
-        side1 = pygame.Rect(x, y, width // 4, height)
-        side2 = pygame.Rect(x + width // 2 - width // 12, y, width // 4, height)
-        side3 = pygame.Rect(x + width - width // 6, y, width // 4, height)
-        side4 = pygame.Rect(x + width // 6, y, width - width // 3, height // 4)
+        side1 = rect(x, y, width // 4, height)
+        side2 = rect(x + width // 2 - width // 12, y, width // 4, height)
+        side3 = rect(x + width - width // 6, y, width // 4, height)
+        side4 = rect(x + width // 6, y, width - width // 3, height // 4)
         obstacle = [
             side1,
             side2,
@@ -153,13 +151,13 @@ class Environment:
         Returns
         -------
         list
-            A collection of sides composing the "C" obstacle as pygame.Rect objects.
+            A collection of sides composing the "C" obstacle as rect tuples.
         '''
         (x, y) = initial_point
         thickness = max(1, height // 3)
-        side1 = pygame.Rect(x, y, thickness, height)
-        side2 = pygame.Rect(x, y, width, thickness)
-        side3 = pygame.Rect(x, y + height - thickness, width, thickness)
+        side1 = rect(x, y, thickness, height)
+        side2 = rect(x, y, width, thickness)
+        side3 = rect(x, y + height - thickness, width, thickness)
         obstacle = [
             side1,
             side2,
@@ -264,29 +262,16 @@ class Environment:
         return self.obstacles
 
     
-    def draw_obstacles(self):
-        '''Draw each side of the obstacles.'''
-        obstacles = []
-        for obstacle in self.obstacles:
-            for side in obstacle:
-                pygame.draw.rect(self.map, self.GRAY, side)
-                obstacles.append(side)
-        file = 'results/maps/map_level_' + str(self.level) + '.png'
-        # if not os.path.exists(file):
-        if True:
-            map = pygame.Surface((self.WIDTH, self.HEIGHT))
-            map.fill(self.WHITE)
-            for obstacle in obstacles:
-                color = self.GRAY
-                pygame.draw.rect(map, color, obstacle)
-            # add the start and goal positions
-            pygame.draw.circle(map, self.GREEN, INITIAL[self.level]['start'], 5)
-            pygame.draw.circle(map, self.RED, INITIAL[self.level]['goal'], 5)
-            pygame.image.save(map, 'results/maps/map_level_' + str(self.level) + '.png')
-        return obstacles
+    def obstacle_rects(self):
+        '''Each side of the obstacles as a flat list of (left, top, width, height) tuples.'''
+        return [side for obstacle in self.obstacles for side in obstacle]
+
 
+if __name__ == '__main__':
+    import render
 
-for level in range(4):
-    env = Environment(map_dimensions=MAP_DIMENSIONS, level=level)
-    env.make_obstacles()
-    env.draw_obstacles()
+    for level in range(4):
+        env = Environment(map_dimensions=MAP_DIMENSIONS, level=level)
+        env.make_obstacles()
+        render.save_map(env, 'results/maps/map_level_' + str(level) + '.png', INITIAL[level]['start'],
+                        INITIAL[level]['goal'])
@@ -1,12 +1,18 @@
-import pygame
 import random
 import math
 import numpy as np
-import queue
+
+import collision
+import search
+from roadmap import Roadmap, UnionFind, UNKNOWN, INVALID, VALID, radius_neighbors, truncated_distance
 
 class Graph:
 	"""
 	A class for the Probabilistic RoadMap (PRM).
+
+	Nodes are robot centers as tuples of ints and obstacles are
+	(left, top, width, height) rectangles, the graph needs no display.
+	Drawing is done by render.Renderer.
 	
 	Attributes
 	----------
@@ -16,54 +22,125 @@ class Graph:
 		End position of the graph in X and Y respectively.
 	map_dimensions : tuple
 		Map width and height in pixels.
+	lazy : bool
+		Defers the edge collision checks from the roadmap construction
+		to the search, where only the edges of candidate paths are checked.
+	collision : str
+		'analytic' to test the obstacles geometrically, 'bitmap' to look
+		them up in the configuration space occupancy bitmap of the map.
+	early_exit : bool
+		Stops checking edges once x_init and x_goal are connected, for
+		sweeps that only need to know whether a path exists.
+	connection : str
+		'knn' to connect every node to its k-nearest neighbors, 'radius' to
+		the nodes within connection_radius and 'prm_star' to the nodes
+		within the PRM* radius gamma * sqrt(log(n) / n) of n nodes.
+	connection_radius : float
+		Connection radius in pixels of the 'radius' connection.
+	gamma : float
+		Scale in pixels of the 'prm_star' radius, by default the PRM*
+		bound for the whole map area.
+	search_backend : str
+		'astar' for the A* search on the roadmap lists, 'csgraph' to check
+		every edge and run scipy.sparse.csgraph Dijkstra on the roadmap.
 	"""
 
-	def __init__(self, start, goal, map_dimensions, radius):
+	def __init__(self, start, goal, map_dimensions, radius, lazy=False, collision='analytic', early_exit=False,
+		connection='knn', connection_radius=None, gamma=None, search_backend='astar'):
 		self.x_init = start
 		self.x_goal = goal
 		self.robot_radius = radius
+		self.lazy = lazy
+		self.collision = collision
+		self.early_exit = early_exit
+		self.connection = connection
+		self.connection_radius = connection_radius
+		self.gamma = gamma
+		self.search_backend = search_backend
 
 		self.WIDTH, self.HEIGHT = map_dimensions
-		self.neighbors = {}
+		self.roadmap = None
+		self.search_stats = {}
 
-		self.obstacles = None
-		self.smooth_path = []
+		# Components of the roadmap over the edges known to be free, and how
+		# the last search ended, see a_star
+		self.components = None
+		self.verdict = None
 
-		# Colors 
-		self.WHITE = (255, 255, 255)
-		self.BLACK = (0, 0, 0)
-		self.RED = (255, 0, 0)
-		self.GREEN = (0, 255, 0)
-		self.BLUE = (0, 0, 255)
-		self.BROWN = (189, 154, 122)
-		self.YELLOW = (255, 255, 0)
-		self.TURQUOISE = (64, 224, 208)
-		self.FUCSIA = (255, 0, 255)
+		# Lookups answered by the roadmap edge validity, and edges actually checked
+		self.edge_cache_hits = 0
+		self.edge_cache_misses = 0
+
+		self.obstacles = []
+		self.smooth_path = []
 
 		self.path_coordinates = []
 
+	@property
+	def obstacles(self):
+		"""Rectangle obstacles of the map."""
+		return self._obstacles
+
+	@obstacles.setter
+	def obstacles(self, obstacles):
+		# Obstacle bounds and their spatial index are compiled once for the
+		# vectorized collision checks, and shared by every graph on the same
+		# map and robot radius
+		self._obstacles = obstacles if obstacles is not None else []
+		self.obstacle_boxes = collision.rects_to_array(self._obstacles)
+		self.obstacle_grid = collision.obstacle_grid(self.obstacle_boxes, self.robot_radius,
+			(self.WIDTH, self.HEIGHT))
+		if self.collision == 'bitmap':
+			self.collision_checker = collision.occupancy_bitmap(self.obstacle_boxes, self.robot_radius,
+				(self.WIDTH, self.HEIGHT))
+		else:
+			self.collision_checker = self.obstacle_grid
+
+	def use_obstacles(self, obstacles, obstacle_boxes, obstacle_grid, collision_checker):
+		"""Sets obstacles already compiled for the map and robot radius of the graph.
+
+		Same as assigning the obstacles, without compiling them or looking
+		them up again, see scenes.LevelContext.
+
+		Parameters
+		----------
+		obstacles : list
+			Rectangle obstacles.
+		obstacle_boxes : numpy.ndarray
+			Their bounds, see collision.rects_to_array.
+		obstacle_grid : collision.ObstacleGrid
+			Their spatial index.
+		collision_checker : collision.ObstacleGrid or collision.OccupancyBitmap
+			The checker of the collision method of the graph.
+		"""
+		self._obstacles = obstacles
+		self.obstacle_boxes = obstacle_boxes
+		self.obstacle_grid = obstacle_grid
+		self.collision_checker = collision_checker
+
 	def is_free(self, point, obstacles):
 		"""Checks if a configuration is colliding with an obstacle.
 
 		When dealing with obstacles it is necessary to check 
 		for the collision with them from the generated node.
+		The graph obstacles are looked up through their spatial index,
+		or their occupancy bitmap.
 
 		Parameters
 		----------
 		point : tuple
-			Point to be checked.
-		obstacles : pygame.Rect
-			Rectangle obstacle.
+			Robot center to be checked.
+		obstacles : list
+			Rectangle obstacles.
 
 		Returns
 		-------
 		bool
 		"""
-		for obstacle in obstacles:
-			if obstacle.colliderect(point):
-				return False
+		if obstacles is self.obstacles:
+			return not self.collision_checker.points_collide([point])[0]
 
-		return True
+		return not collision.points_collide([point], collision.rects_to_array(obstacles), self.robot_radius)[0]
 
 	def generate_random_node(self):
 		"""Generates a random node on the screen.
@@ -81,14 +158,7 @@ class Graph:
 			Coordinates of the random node. 
 		"""
 		x, y = random.uniform(0, self.WIDTH), random.uniform(0, self.HEIGHT)
-		x_rand = int(x), int(y) # To use within the class
-
-		# Rectangle generated around the generated random node
-		left = x_rand[0] - self.robot_radius
-		top = x_rand[1] - self.robot_radius
-		width = 2*self.robot_radius
-		height = width
-		self.x_rand = pygame.Rect(left, top, width, height)
+		self.x_rand = int(x), int(y) # To use within the class
 
 		return self.x_rand
 
@@ -110,14 +180,7 @@ class Graph:
 			Coordinates of the given node.
 		"""
 
-		x = int(unit_pt[0]*self.WIDTH), int(unit_pt[1]*self.HEIGHT)
-
-		# Rectangle generated around the generated random node
-		left = x[0] - self.robot_radius
-		top = x[1] - self.robot_radius
-		width = 2*self.robot_radius
-		height = width
-		self.x_rand = pygame.Rect(left, top, width, height)
+		self.x_rand = int(unit_pt[0]*self.WIDTH), int(unit_pt[1]*self.HEIGHT)
 
 		return self.x_rand
 
@@ -138,51 +201,150 @@ class Graph:
 		"""
 		return int(math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2))
 
-	def k_nearest(self, graph, x_rand, configuration, k=2):
-		"""Given k, it returns the k-nearest neighbors of x_rand.
+	def k_nearest_all(self, configurations, k=2, block=256):
+		"""Returns the k-nearest neighbors of every configuration at once.
+
+		Every configuration is compared against the list without its first
+		equal node. Distances are computed as arrays over all node
+		centers and truncated to integers like euclidean_distance, and the
+		neighbors are selected with argpartition, which fixes how ties are
+		resolved.
+
+		Parameters
+		----------
+		configurations : list
+			Collection of node centers in the graph.
+		k : int
+			Number of the closest neighbors to examine for each configuration.
+		block : int
+			Number of configurations whose distances are computed together.
+
+		Returns
+		-------
+		numpy.ndarray
+			Indices into configurations of shape (n, k), nearest first.
+		"""
+		centers = np.array(configurations, dtype=np.int32).reshape(-1, 2)
+		n = len(configurations)
+
+		# list.remove drops the first node equal to the configuration
+		_, first, inverse = np.unique(centers, axis=0, return_index=True, return_inverse=True)
+		removed = first[inverse.ravel()]
+
+		near = np.empty((n, k), dtype=np.int64)
+		for start in range(0, n, block):
+			rows = np.arange(start, min(start + block, n))
+			dx = centers[rows, 0, None] - centers[:, 0]
+			dy = centers[rows, 1, None] - centers[:, 1]
+			# Squared pixel distances are exact in float32, and so is their truncated root
+			distances = np.sqrt(dx * dx + dy * dy, dtype=np.float32).astype(np.int32)
+
+			keep = np.ones((len(rows), n), dtype=bool)
+			keep[np.arange(len(rows)), removed[rows]] = False
+			others = np.broadcast_to(np.arange(n), keep.shape)[keep].reshape(len(rows), n - 1)
+			distances = distances[keep].reshape(len(rows), n - 1)
 
-        Searches in the graph for the k-nearest neighbors.
+			k_indices = np.argpartition(distances, k, axis=1)[:, :k]
+			k_distances = np.take_along_axis(distances, k_indices, axis=1)
+			k_indices_sorted = np.take_along_axis(k_indices, np.argsort(k_distances, axis=1), axis=1)
+			near[rows] = np.take_along_axis(others, k_indices_sorted, axis=1)
+
+		return near
+
+	def build_roadmap(self, configurations, k=2):
+		"""Builds the roadmap over the given configurations.
+
+		Every configuration is connected to its k-nearest neighbors, or to
+		the ones within the connection radius, and all the resulting edges
+		are checked against the obstacles, unless the graph is lazy, in
+		which case they are only recorded as candidates.
+
+		Parameters
+		----------
+		configurations : list
+			Collection of node centers in the graph.
+		k : int
+			Number of the closest neighbors to examine for each configuration.
+
+		Returns
+		-------
+		Roadmap
+			Node coordinates, CSR adjacency and edge validity.
+		"""
+		self.roadmap = None
+		return self.connect(configurations=configurations, k=k)
+
+	def grow_roadmap(self, configurations, k=2):
+		"""Extends the roadmap with the configurations appended since the last build.
+
+		The configurations must start with the ones of the current roadmap,
+		in the same order. The neighbors are selected again over all the
+		configurations, so the roadmap is the same as the one build_roadmap
+		gives, but only the edges that did not exist yet are checked.
+
+		Parameters
+		----------
+		configurations : list
+			Collection of node centers in the graph.
+		k : int
+			Number of the closest neighbors to examine for each configuration.
+
+		Returns
+		-------
+		Roadmap
+			Node coordinates, CSR adjacency and edge validity.
+		"""
+		return self.connect(configurations=configurations, k=k)
+
+	def connect(self, configurations, k=2):
+		"""Connects the configurations and checks the new edges, see build_roadmap and grow_roadmap.
+
+		Parameters
+		----------
+		configurations : list
+			Collection of node centers in the graph.
+		k : int
+			Number of the closest neighbors to examine for each configuration.
 
-        Parameters
-        ----------
-        graph : list
-            Graph containing all the coordinate nodes.
-        x_rand : tuple or Rect
-            Coordinate of the random node generated.
-        configuration : tuple or Rect
-            Current configuration to search its k-neighbors.
-        k : int
-            Number of the closest neighbors to examine for each configuration.
+		Returns
+		-------
+		Roadmap
+			Node coordinates, CSR adjacency and edge validity.
+		"""
+		centers = np.array(configurations, dtype=np.int32).reshape(-1, 2)
+		grows = self.roadmap is not None and self.roadmap.n_nodes <= len(configurations)
 
-        Returns
-        -------
-        list
-            Nearest nodes to the random node generated.
-        """
-		# Extract centers if Rect objects are provided
-		if hasattr(x_rand, 'center'):
-			x_rand = x_rand.center
-		if hasattr(configuration, 'center'):
-			configuration = configuration.center
+		# The graph is simply built again, the validity of the edges it keeps is inherited
+		if self.connection == 'knn':
+			roadmap = Roadmap.from_neighbors(centers, self.k_nearest_all(configurations=configurations, k=k))
+		else:
+			indptr, indices = radius_neighbors(centers, self.neighbor_radius(len(configurations)))
+			roadmap = Roadmap(centers, indptr, indices)
 
-		# Get the centers of the nodes in the graph
-		graph_ = [node.center if hasattr(node, 'center') else node for node in graph]
+		if grows:
+			roadmap.inherit_validity(self.roadmap)
 
-		# Calculate all distances to x_rand
-		distances = [self.euclidean_distance(state, x_rand) for state in graph_]
+		self.roadmap = roadmap
+		self.components = UnionFind(roadmap.n_nodes)
+		self.components.union_pairs(roadmap.pairs[roadmap.validity == VALID])
 
-		# Find the indices of the k-nearest neighbors
-		k_indices = np.argpartition(distances, k)[:k]
-		k_indices_sorted = k_indices[np.argsort(np.array(distances)[k_indices])]
+		if self.early_exit and not self.lazy:
+			self.check_edges_until_connected()
+		elif not self.lazy:
+			self.check_edges(self.roadmap.edge_ids)
 
-		# Collect the nearest configurations
-		near = [graph_[i] for i in k_indices_sorted]
-		near_configurations = [node for node in graph if node.center in near]
+		return self.roadmap
 
-		# Update the neighbors for the given configuration
-		self.neighbors.update({configuration: near})
+	def neighbor_radius(self, n):
+		"""Connection radius in pixels of a roadmap of n nodes."""
+		if self.connection == 'radius':
+			return self.connection_radius
 
-		return near_configurations
+		# PRM* radius in the plane, with the whole map as free space by default
+		gamma = self.gamma
+		if gamma is None:
+			gamma = 2 * math.sqrt(1.5) * math.sqrt(self.WIDTH * self.HEIGHT / math.pi)
+		return gamma * math.sqrt(math.log(n) / n) if n > 1 else 0
 
 	def interpolation(self, p1, p2):
 		"""Interpolates a line.
@@ -218,8 +380,8 @@ class Graph:
 		"""Checks if a set of configurations crosses an obstacle.
 
 		Given two configurations configuration1, configuration2
-		an interpolation between such two configurations is done
-		to check if any of the points in between lie on the obstacle.
+		the robot is swept along the segment between them and checked
+		against every obstacle grown by the robot radius.
 
 		Parameters
 		----------
@@ -228,42 +390,141 @@ class Graph:
 		configuration2 : tuple 
 			End configuration.
 		map_ : pygame.Surface
-			Environment to draw on.
+			Unused, kept for the callers that pass the map.
 
 		Returns
 		-------
 		bool
 		"""
-		obs = self.obstacles.copy()
+		return bool(self.cross_obstacles([configuration1], [configuration2])[0])
+
+	def cross_obstacles(self, starts, ends):
+		"""Checks a batch of edges against the obstacles.
+
+		Parameters
+		----------
+		starts : array_like
+			Centers of the initial configurations, shape (e, 2).
+		ends : array_like
+			Centers of the end configurations, shape (e, 2).
+
+		Returns
+		-------
+		numpy.ndarray
+			Boolean array of shape (e,), True where the edge crosses an obstacle.
+		"""
+		return self.collision_checker.segments_collide(starts, ends)
+
+	def check_edges(self, edges):
+		"""Checks a batch of undirected roadmap edges.
+
+		Validity is stored per undirected edge of the roadmap, so every
+		geometric edge is checked against the obstacles at most once,
+		no matter how many times or in which direction it is queried.
+
+		Parameters
+		----------
+		edges : numpy.ndarray
+			Undirected edge ids, e.g. Roadmap.edge_ids of directed edges.
+
+		Returns
+		-------
+		numpy.ndarray
+			Boolean array of the same shape, True where the edge is free.
+		"""
+		edges = np.asarray(edges)
+		unknown = np.unique(edges[self.roadmap.validity[edges] == UNKNOWN])
+
+		if len(unknown) > 0:
+			pairs = self.roadmap.pairs[unknown]
+			coordinates = self.roadmap.coordinates
+			crossing = self.cross_obstacles(coordinates[pairs[:, 0]], coordinates[pairs[:, 1]])
+			self.roadmap.validity[unknown] = ~crossing
+			self.components.union_pairs(pairs[~crossing])
+
+		self.edge_cache_misses += len(unknown)
+		self.edge_cache_hits += edges.size - len(unknown)
+
+		return self.roadmap.validity[edges] == VALID
 
-		# Get the rectangle center 
-		configuration1_ = configuration1.center
-		configuration2_ = configuration2.center
-		
-		configuration11, configuration12 = configuration1_[0], configuration1_[1]
-		configuration21, configuration22 = configuration2_[0], configuration2_[1]
+	def edge_free(self, edge):
+		"""Checks a single undirected roadmap edge."""
+		validity = self.roadmap.validity[edge]
+		if validity == UNKNOWN:
+			return bool(self.check_edges([edge])[0])
 
-		while len(obs) > 0:
-			rectangle = obs.pop(0)
-			# Interpolation
-			for i in range(0, 101):
-				u = i / 100
-				x = configuration11 * u + configuration21 * (1 - u)
-				y = configuration12 * u + configuration22 * (1 - u)
+		self.edge_cache_hits += 1
+		return validity == VALID
 
-				# Copy and reposition the center
-				configuration2_copy = configuration2.copy()
-				configuration2_copy.center = (x, y)
+	def check_edges_until_connected(self, chunk=256):
+		"""Checks the roadmap edges in chunks until x_init and x_goal are connected.
 
-				if rectangle.colliderect(configuration2_copy):
-					return True
+		Returns
+		-------
+		bool
+			Whether x_init and x_goal are connected by edges known to be free.
+		"""
+		start_, goals = self.endpoints()
+		unknown = np.flatnonzero(self.roadmap.validity == UNKNOWN)
+		for i in range(0, len(unknown), chunk):
+			if self.connected(start_, goals):
+				break
+			self.check_edges(unknown[i:i + chunk])
+
+		return self.connected(start_, goals)
+
+	def connected(self, start, goals):
+		"""Checks if the start node shares a component with any of the goal nodes."""
+		if start is None:
+			return False
+		return any(self.components.connected(start, goal) for goal in goals)
+
+	def edge_validated(self, edge):
+		"""Checks a single undirected roadmap edge without checking it, unchecked edges fail it."""
+		return self.roadmap.validity[edge] == VALID
+
+	def edge_possible(self, edge):
+		"""Optimistic check of a single undirected roadmap edge, only known collisions fail it."""
+		return self.roadmap.validity[edge] != INVALID
+
+	def endpoints(self):
+		"""Node at x_init, None when there is none, and the set of nodes at x_goal."""
+		start_ = self.find_node(self.x_init)
+		coordinates = self.roadmap.coordinates
+		goals = set(np.flatnonzero((coordinates == np.asarray(self.x_goal, dtype=np.float32)).all(axis=1)).tolist())
+		return start_, goals
+
+	def find_node(self, point):
+		"""Index of the roadmap node at the given point.
+
+		Falls back to the first node within the robot radius of the point
+		when no node is centered on it, and None when there is none.
+		"""
+		coordinates = self.roadmap.coordinates
+		exact = np.flatnonzero((coordinates == np.asarray(point, dtype=np.float32)).all(axis=1))
+		if len(exact) > 0:
+			return int(exact[0])
 
-		return False
+		near = np.flatnonzero(truncated_distance(coordinates, point) <= self.robot_radius)
+		return int(near[0]) if len(near) > 0 else None
 
 	def a_star(self, start=(50, 50), end=(540, 380), nodes=None, map_=None):
 		"""A* algorithm.
 
-		A* algorithm for pathfinding in the graph.
+		A* algorithm for pathfinding in the roadmap, from x_init to x_goal.
+		The statistics of the search are kept in search_stats.
+
+		A lazy graph searches assuming every unchecked edge is free, checks
+		the edges of the path found and searches again without the ones in
+		collision, until the path is free or no path is left. This gives
+		the same verdict as checking every edge beforehand.
+
+		How the search ended is kept in verdict: 'path' when a path was
+		found, 'no_path' when the search failed, 'disconnected' when every
+		edge is checked and x_init and x_goal lie in different components,
+		so no search is run, and 'connected' when an early exit graph finds
+		a path over the edges checked before x_init and x_goal got connected.
+		That path is not the shortest one in general.
 
 		start : tuple
 			Start node.
@@ -272,69 +533,80 @@ class Graph:
 		nodes : list
 			Collection of nodes in the graph.
 		map_ : pygame.Surface
-			Environment to draw on.
+			Unused, kept for the callers that pass the map.
 		"""		
-		open_set = queue.PriorityQueue()
-		open_set.put((0, self.x_init)) # (f-score, start)
-		came_from = {}
-
-		# Initialize to infinity all g-score and f-score nodes but the start 
-		g_score = {node.center: float('inf') for node in nodes}
-		g_score[self.x_init] = 0
-		f_score = {node.center: float('inf') for node in nodes}
-		f_score[self.x_init] = self.heuristic(self.x_init, self.x_goal)
-		open_set_hash = {self.x_init}
-
-		while not open_set.empty(): 
-			current = open_set.get()[1]
-
-			open_set_hash.remove(current)
-
-			# Debugging statement
-			if current not in self.neighbors:
-				# find a point that is in self.neighbors and is within the radius to the current point
-				for nei in self.neighbors:
-					if self.euclidean_distance(current, nei) <= self.robot_radius:
-						current = nei
-						break
-
-			# Get the correspondant rectangle of the center point for the current configuration
-			for node in nodes:
-				if node.center == current:
-					current_ = node
-
-			if current == self.x_goal:
-				self.reconstruct_path(came_from, current, map_)
-				return True
-
-			# k-nearest
-			for neighbor in self.neighbors[current]:
-				# Get the correspondant rectangle of the center point for the 
-				# k-nearest neighbor configuration
-				for node in nodes:
-					if node.center == neighbor:
-						neighbor_ = node
-
-				temp_g_score = g_score[current] + self.euclidean_distance(current, neighbor)
-				cross_obstacle = self.cross_obstacle(configuration1=current_, 
-					configuration2=neighbor_, map_=map_)
-
-				if temp_g_score < g_score[neighbor] and not cross_obstacle:
-					came_from[neighbor] = current
-					g_score[neighbor] = temp_g_score
-					f_score[neighbor] = temp_g_score + self.heuristic(neighbor, end)
-
-					if neighbor not in open_set_hash:
-						open_set.put((f_score[neighbor], neighbor))
-						open_set_hash.add(neighbor)
-
-	def reconstruct_path(self, came_from, current, map_):
+		start_, goals = self.endpoints()
+		self.verdict = 'no_path'
+		self.search_stats = {}
+		if start_ is None:
+			return
+
+		if self.search_backend == 'csgraph':
+			# The whole roadmap is searched at once, every edge has to be known
+			self.check_edges(self.roadmap.edge_ids)
+
+		# Edges known to be free are all the edges there are, and they do not reach a goal
+		if not self.connected(start_, goals) and not (self.roadmap.validity == UNKNOWN).any():
+			self.verdict = 'disconnected'
+			return
+
+		if self.search_backend == 'csgraph':
+			path = self.csgraph_search(start_, goals)
+		elif self.lazy:
+			path = self.lazy_a_star(start_, goals, end)
+		else:
+			path = None
+			if self.early_exit and self.connected(start_, goals):
+				path, self.search_stats = search.a_star(self.roadmap, start_, goals, end, self.edge_validated)
+				if path is not None:
+					self.verdict = 'connected'
+				else:
+					# The connection needs edges against their direction, check the rest as usual
+					self.check_edges(self.roadmap.edge_ids)
+
+			if path is None:
+				path, self.search_stats = search.a_star(self.roadmap, start_, goals, end, self.edge_free)
+
+		if path is not None:
+			if self.verdict != 'connected':
+				self.verdict = 'path'
+			self.reconstruct_path(path, map_)
+			return True
+
+	def csgraph_search(self, start, goals):
+		"""Shortest path to the nearest goal node with scipy.sparse.csgraph, see a_star."""
+		distances, predecessors, _ = search.csgraph_shortest_paths(self.roadmap, [start])
+		self.search_stats = {'reached': int(np.isfinite(distances).sum())}
+
+		reached = [goal for goal in sorted(goals) if np.isfinite(distances[goal])]
+		if not reached:
+			return None
+
+		return search.reconstruct(predecessors, min(reached, key=lambda goal: distances[goal]))
+
+	def lazy_a_star(self, start, goals, end):
+		"""Searches and checks candidate paths until one is free, see a_star."""
+		self.search_stats = {'expanded': 0, 'pushed': 0, 'stale': 0, 'relaxed': 0, 'replans': 0}
+
+		while True:
+			path, stats = search.a_star(self.roadmap, start, goals, end, self.edge_possible)
+			for key, value in stats.items():
+				self.search_stats[key] += value
+
+			if path is None or self.check_edges(self.roadmap.path_edges(path)).all():
+				break
+			self.search_stats['replans'] += 1
+
+		# Edges an eager construction would have checked but were never needed
+		self.search_stats['checks_avoided'] = len(self.roadmap.pairs) - int((self.roadmap.validity != UNKNOWN).sum())
+		return path
+
+	def reconstruct_path(self, path, map_):
 		"""Reconstruct the path from point A to B."""
 		self.path_coordinates.append(self.x_goal)
 
-		while current in came_from:
-			current = came_from[current]
-			self.path_coordinates.append(current)
+		for node in path[-2::-1]:
+			self.path_coordinates.append(self.roadmap.center(node))
 
 		self.generate_smooth_path()
 
@@ -349,87 +621,6 @@ class Graph:
 		self.smooth = [coord for coords in self.smooth_path[::-1] for coord in coords]
 		self.smooth_path = []
 	
-	def draw_path_to_goal(self, map_, environment, obstacles):
-		"""Draws the path from the x_goal node to the x_init node."""
-		self.draw_initial_node(map_=environment.map)
-		self.draw_goal_node(map_=environment.map)
-
-		if obstacles != []:
-			environment.draw_obstacles()
-
-		for i in range(len(self.path_coordinates)-1):
-			pygame.draw.line(surface=environment.map, color=self.RED, \
-				start_pos=self.path_coordinates[i], end_pos=self.path_coordinates[i+1], width=4)
-
-		self.refresh_screen(map_=environment.map, seconds=3)
-
 	def heuristic(self, p1, p2):
 		"""Heuristic distance from point to point."""
 		return self.euclidean_distance(p1, p2)
-
-	def draw_random_node(self, map_):
-		"""Draws the x_rand node."""
-		pygame.draw.circle(surface=map_, color=self.GREEN, center=self.x_rand.center, 
-			radius=self.robot_radius, width=0)
-
-	def draw_initial_node(self, map_):
-		"""Draws the x_init node."""
-		return pygame.draw.circle(surface=map_, color=self.BLUE, center=self.x_init, 
-			radius=self.robot_radius)
-
-	def draw_goal_node(self, map_):
-		"""Draws the x_goal node."""
-		return pygame.draw.circle(surface=map_, color=self.RED, center=self.x_goal, 
-			radius=self.robot_radius)
-
-	def draw_local_planner(self, p1, p2, map_):
-		"""Draws the local planner from node to node."""
-		try:
-			pygame.draw.line(surface=map_, color=self.BLACK, start_pos=p1.center, end_pos=p2.center)
-		except AttributeError:
-			pygame.draw.line(surface=map_, color=self.BLACK, start_pos=p1, end_pos=p2)
-
-	def move_robot(self, position, map_):
-		"""Draws the robot moving at the given position."""
-		pygame.draw.circle(surface=map_, color=(0, 0, 255),	center=position, 
-			radius=self.robot_radius)
-
-	def draw_roadmap(self, configurations, nears, map_, k):
-		"""Draws the roadmap constantly. Used to display it in an infinite loop."""
-		self.draw_initial_node(map_=map_)
-		self.draw_goal_node(map_=map_)
-
-		for node, neighbors in self.neighbors.items():
-			for neighbor in neighbors:
-				self.draw_local_planner(p1=node, p2=neighbor, map_=map_)
-
-	def refresh_screen(self, map_, seconds):
-		"""Updates the screen information and waits the given seconds."""
-		seconds = int(seconds * 100)
-
-		# Refresh the screen
-		pygame.display.update()
-		pygame.time.delay(seconds)
-		map_.fill(self.WHITE)
-
-	def draw_trajectory(self, configurations, nears, environment, obstacles, k, keep_roadmap, duration=0.02):
-		"""Draws the robot moving in the map."""
-		if not hasattr(self, 'smooth'):
-			return
-		for i in range(len(self.smooth)):
-			robot_position = self.smooth[i]
-
-			if obstacles != []:
-				environment.draw_obstacles()
-
-			if keep_roadmap:
-				self.draw_roadmap(configurations=configurations, nears=nears, map_=environment.map,
-					k=k)
-
-			# Draw initial and final robot configuration constantly
-			self.draw_initial_node(map_=environment.map)
-			self.draw_goal_node(map_=environment.map)
-
-			# Draw path to goal, and the robot movement constantly
-			self.move_robot(position=robot_position, map_=environment.map)
-			self.refresh_screen(map_=environment.map, seconds=duration)
\ No newline at end of file
@@ -0,0 +1,82 @@
+# Import-time budget of the planning modules. Importing them in a fresh
+# interpreter must not load any of the heavy optional dependencies and must
+# stay within the time budget, otherwise the script exits with an error.
+#
+#   python import_budget.py --budget_ms 500
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules every planning run imports
+MODULES = ['sampler', 'environment', 'graph', 'scenes', 'pointsets', 'planner']
+
+# Packages only the plotting, drawing or QMC paths may import
+FORBIDDEN = ['torch', 'matplotlib', 'pygame', 'scipy', 'tqdm']
+
+
+def import_times(modules):
+    '''
+    Imports the modules in a new interpreter with -X importtime.
+
+    Parameters
+    ----------
+    modules : list
+        Names of the modules to import, in order.
+
+    Returns
+    -------
+    tuple
+        Self and cumulative import time in microseconds of every module
+        imported on the way, by module name, and the names of the modules
+        imported directly rather than by another module.
+    '''
+    command = [sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)]
+    process = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True,
+                             text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr)
+
+    times = {}
+    top_level = set()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+        # Nested imports are indented below the module importing them
+        if not name[1:].startswith(' '):
+            top_level.add(name.strip())
+    return times, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks the import time of the planning modules.')
+    parser.add_argument('--budget_ms', type=float, default=500,
+                        help='Largest total import time of the modules in milliseconds')
+    args = parser.parse_args()
+
+    times, top_level = import_times(MODULES)
+    # Modules already loaded by an earlier one count within that one
+    total = sum(times[module][1] for module in MODULES if module in top_level) / 1000
+    loaded = sorted({name.split('.')[0] for name in times} & set(FORBIDDEN))
+
+    print(f'Importing {", ".join(MODULES)} took {total:.0f} ms (budget {args.budget_ms:.0f} ms)')
+    for module in MODULES:
+        if module in times:
+            print(f'  {module:12s} {times[module][1] / 1000:8.1f} ms')
+
+    failures = []
+    if loaded:
+        failures.append(f'heavy dependencies imported: {", ".join(loaded)}')
+    if total > args.budget_ms:
+        failures.append(f'import time {total:.0f} ms over the budget of {args.budget_ms:.0f} ms')
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
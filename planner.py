@@ -0,0 +1,151 @@
+# Multi-query planning: one roadmap per sample set and map, answering any
+# number of start and goal queries.
+
+import numpy as np
+
+import graph
+import search
+from roadmap import truncated_distance
+
+
+class MultiQueryPlanner:
+    '''
+    A roadmap built once and queried for many start and goal pairs.
+
+    Start and goal points are attached to their nearest roadmap nodes
+    through collision checked connections that are never added to the
+    roadmap, so queries leave it untouched. The shortest path tree towards
+    every goal is cached, later queries to the same goal only attach their
+    start and follow the tree.
+
+    Attributes
+    ----------
+    points : numpy.ndarray
+        Samples in the unit square of shape (n, 2), see sampler.sampler.
+    obstacles : list
+        Rectangle obstacles of the map.
+    map_dimensions : tuple
+        Map width and height in pixels.
+    radius : int
+        Robot radius.
+    k : int
+        Number of neighbors of every roadmap node and of every query point.
+    collision : str
+        Collision checking of the graph, see graph.Graph.
+    '''
+
+    def __init__(self, points, obstacles, map_dimensions, radius, k=15, collision='analytic'):
+        self.k = k
+        self.graph = graph.Graph(start=None, goal=None, map_dimensions=map_dimensions, radius=radius,
+                                 collision=collision)
+        self.graph.obstacles = obstacles
+
+        configurations = [self.graph.generate_input_nodes(point) for point in points]
+        configurations = [x for x in configurations if self.graph.is_free(point=x, obstacles=self.graph.obstacles)]
+        self.cardinality = len(configurations)
+        self.roadmap = self.graph.build_roadmap(configurations=configurations, k=k)
+        from scipy.spatial import cKDTree
+
+        self.index = cKDTree(self.roadmap.coordinates)
+
+        # Valid edges grouped by their target node, the goal trees are grown
+        # backwards along them
+        mask = self.roadmap.valid
+        targets = self.roadmap.indices[mask]
+        order = np.argsort(targets, kind='stable')
+        indptr = np.zeros(self.roadmap.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=self.roadmap.n_nodes), out=indptr[1:])
+        self._reverse = (indptr.tolist(), self.roadmap.sources[mask][order].tolist(),
+                         self.roadmap.weights[mask][order].tolist())
+
+        self.trees = {}
+        self.stats = {'queries': 0, 'trees_built': 0, 'connections_checked': 0}
+
+    def is_free(self, point):
+        '''Checks if the robot centered at the given point overlaps no obstacle.'''
+        return not self.graph.collision_checker.points_collide([point])[0]
+
+    def attach(self, point):
+        '''
+        Connects a point to its nearest roadmap nodes.
+
+        Parameters
+        ----------
+        point : tuple
+            Robot center to connect.
+
+        Returns
+        -------
+        tuple
+            Nodes reachable from the point by a collision free straight
+            motion and the length of each connection.
+        '''
+        k = min(self.k, self.roadmap.n_nodes)
+        _, nodes = self.index.query(point, k=k)
+        nodes = np.atleast_1d(nodes)
+        ends = self.roadmap.coordinates[nodes]
+        starts = np.broadcast_to(np.asarray(point, dtype=np.float64), ends.shape)
+        free = ~self.graph.cross_obstacles(starts, ends)
+        self.stats['connections_checked'] += len(nodes)
+        return nodes[free], truncated_distance(ends[free], point)
+
+    def goal_tree(self, goal):
+        '''
+        Shortest path tree of the roadmap towards a goal, cached per goal.
+
+        Returns
+        -------
+        tuple
+            Distance to the goal of every node, inf where it is unreachable,
+            and the next node on the way there, -1 where the goal follows.
+        '''
+        goal = tuple(goal)
+        if goal not in self.trees:
+            nodes, lengths = self.attach(goal)
+            sources = {}
+            for node, length in zip(nodes.tolist(), lengths.tolist()):
+                sources[node] = min(length, sources.get(node, length))
+            self.trees[goal] = search.dijkstra(*self._reverse, sources=sources)
+            self.stats['trees_built'] += 1
+
+        return self.trees[goal]
+
+    def query(self, start, goal):
+        '''
+        Shortest roadmap path between two points.
+
+        Parameters
+        ----------
+        start : tuple
+            Initial position in X and Y respectively.
+        goal : tuple
+            End position in X and Y respectively.
+
+        Returns
+        -------
+        tuple
+            Path coordinates from the goal back to the start, as
+            Graph.path_coordinates, and the path length, or (None, None)
+            when the points cannot be connected through the roadmap.
+        '''
+        self.stats['queries'] += 1
+        start, goal = tuple(start), tuple(goal)
+        if not (self.is_free(start) and self.is_free(goal)):
+            return None, None
+
+        distances, next_node = self.goal_tree(goal)
+        nodes, lengths = self.attach(start)
+        costs = [length + distances[node] for node, length in zip(nodes.tolist(), lengths.tolist())]
+        if not costs or min(costs) == np.inf:
+            return None, None
+
+        node = nodes[int(np.argmin(costs))]
+        path = [start]
+        while node != -1:
+            path.append(self.roadmap.center(node))
+            node = next_node[node]
+        path.append(goal)
+
+        path_coordinates = path[::-1]
+        length = float(np.linalg.norm(np.diff(np.array(path_coordinates, dtype=np.float64), axis=0), axis=1).sum())
+        return path_coordinates, length
@@ -0,0 +1,143 @@
+# Store of the precomputed MPMC point sets. Files are memory-mapped once per
+# process and the L2-star discrepancy of every batch is kept in a sidecar
+# index next to each file, so it is only computed the first time.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Directory holding MPMC_points and L2_MPMC_points, the repository by default
+POINTS_ROOT = os.environ.get('PRM_POINTS_ROOT', os.path.dirname(os.path.abspath(__file__)))
+
+# Point set files of every family, relative to the root
+FAMILIES = {'mpmc': 'MPMC_points/MPMC_d2_N{n}.npy',
+            'l2': 'L2_MPMC_points/MPMC_d2_N{n}.npy',
+            'ordered': 'MPMC_points/ordered_MPMC_d2_N1024.npy'}
+
+
+class PointSetStore:
+    '''
+    Read-only access to batches of point sets stored as .npy files.
+
+    A file of shape (b * n, 2) holds b batches of n points. Batches are
+    returned as views of the memory-mapped file, they must be copied
+    before being modified.
+
+    Attributes
+    ----------
+    root : str
+        Directory the family paths are relative to.
+    '''
+
+    def __init__(self, root=None):
+        self.root = root if root is not None else POINTS_ROOT
+        self._arrays = {}
+        self._indices = {}
+
+    def path(self, family, n):
+        '''Path of the point set file of a family and number of points.'''
+        return os.path.join(self.root, FAMILIES[family].format(n=n))
+
+    def array(self, family, n):
+        '''Memory-mapped points of a file, opened once.'''
+        file = self.path(family, n)
+        if file not in self._arrays:
+            self._arrays[file] = np.load(file, mmap_mode='r')
+        return self._arrays[file]
+
+    def n_batches(self, family, n):
+        '''Number of whole batches of n points in a file.'''
+        return len(self.array(family, n)) // n
+
+    def batch(self, family, n, batch_id):
+        '''
+        Batch of n points of a file, without copying.
+
+        Parameters
+        ----------
+        family : str
+            Point set family, see FAMILIES.
+        n : int
+            Number of points of every batch.
+        batch_id : int
+            Index of the batch in the file.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only view of shape (n, 2), or None when the file has no
+            such batch.
+        '''
+        if not 0 <= batch_id < self.n_batches(family, n):
+            return None
+        return self.array(family, n)[batch_id * n:(batch_id + 1) * n]
+
+    def index(self, family, n):
+        '''
+        L2-star discrepancy of every batch of a file and the best batch.
+
+        The index is read from the sidecar file next to the points, and
+        computed and written there when it is missing or was computed for
+        a different content.
+
+        Returns
+        -------
+        dict
+            'discrepancies' of every batch and the id of the 'best' one.
+        '''
+        file = self.path(family, n)
+        if file not in self._indices:
+            data = self.array(family, n)
+            digest = hashlib.sha1(np.ascontiguousarray(data).tobytes()).hexdigest()
+            sidecar = file + '.index.json'
+            index = None
+            if os.path.exists(sidecar):
+                try:
+                    with open(sidecar) as f:
+                        index = json.load(f)
+                except json.JSONDecodeError:
+                    # A damaged index is computed again
+                    index = None
+                if index is not None and (index.get('sha1') != digest or index.get('n') != n):
+                    index = None
+
+            if index is None:
+                from scipy.stats.qmc import discrepancy as L2discrepancy
+
+                discrepancies = [float(L2discrepancy(data[b * n:(b + 1) * n], method='L2-star'))
+                                 for b in range(len(data) // n)]
+                index = {'n': n, 'sha1': digest, 'discrepancies': discrepancies,
+                         'best': int(np.argmin(discrepancies))}
+                # Written aside and moved into place, so that other processes
+                # never read a partial index
+                temporary = sidecar + '.' + str(os.getpid()) + '.tmp'
+                try:
+                    with open(temporary, 'w') as f:
+                        json.dump(index, f, indent=1)
+                        f.write('\n')
+                    os.replace(temporary, sidecar)
+                except OSError:
+                    # Read-only stores keep the index in memory only
+                    if os.path.exists(temporary):
+                        os.remove(temporary)
+
+            self._indices[file] = index
+        return self._indices[file]
+
+    def best_batch(self, family, n):
+        '''
+        Batch of n points with the lowest L2-star discrepancy.
+
+        Returns
+        -------
+        tuple
+            Batch id and its discrepancy.
+        '''
+        index = self.index(family, n)
+        return index['best'], index['discrepancies'][index['best']]
+
+
+# Store shared by the samplers
+store = PointSetStore()
@@ -1,14 +1,14 @@
-import pygame
-import environment
-import graph
+import planner
+import scenes
+import results_store
 import argparse
 import sys
-from sampler import sampler
+import time
+from sampler import sampler, sample_batch
 import numpy as np
 from tqdm import tqdm
-import os
 
-from config import SAMPLERS, MAP_DIMENSIONS, INITIAL
+from config import SAMPLERS, PREFIX_SAMPLERS, DETERMINISTIC_SAMPLERS, MPMC_SAMPLERS, MPMC_NODES, SUCCESS_VERDICTS
 
 # Command line arguments
 parser = argparse.ArgumentParser(description='Implements the PRM algorithm for path planning.')
@@ -25,188 +25,331 @@ parser.add_argument('-kr', '--keep_roadmap', type=bool, action=argparse.BooleanO
 parser.add_argument('-r', '--radius', type=int, metavar='', required=False, default=10,
                     help='Set the robot radius')
 parser.add_argument('-s', '--save', type=bool, action=argparse.BooleanOptionalAction,
-                    metavar='', required=False, default=False, help='Save the results to a numpy file')
+                    metavar='', required=False, default=False, help='Append the results to the results store')
 parser.add_argument('--draw', type=bool, action=argparse.BooleanOptionalAction,
                     metavar='', required=False, default=False, help='Draw the environment')
 parser.add_argument('--overwrite', type=bool, action=argparse.BooleanOptionalAction,
-                    metavar='', required=False, default=True, help='Overwrite the results file')
+                    metavar='', required=False, default=True,
+                    help='Replace the stored results of the same queries, otherwise only add the new ones')
 parser.add_argument('-d', '--duration', type=float, default=0.02, help='Duration of the simulation')
 parser.add_argument('--level', type=int, default=1, help='Difficulty level of the environment')
 parser.add_argument('--reps', type=int, default=20, help='Number of repetitions for each randomized sampler')
-
-args = parser.parse_args()
-
-# Initialization
-pygame.init()
-
-def run_prm_iteration(distribution, x_init, x_goal, level, rep):
-    environment_ = environment.Environment(map_dimensions=MAP_DIMENSIONS, level=level)
-    graph_ = graph.Graph(start=x_init, goal=x_goal, map_dimensions=MAP_DIMENSIONS, radius=args.radius)
-    configurations = []
-    nears = []
-    success_configurations = []
-    success_nears = []
-    initial = graph_.draw_initial_node(map_=environment_.map)
-    goal = graph_.draw_goal_node(map_=environment_.map)
-    configurations.append(initial)
-    configurations.append(goal)
-    environment_.make_obstacles()
-    obstacles = environment_.draw_obstacles() if args.obstacles else []
-    graph_.obstacles = obstacles
-    is_simulation_finished = False
-    is_configuration_free = True
-
-    # Number of nodes to put in the roadmap
-    n = 0
+parser.add_argument('--connection', type=str, choices=['knn', 'radius', 'prm_star'], default='knn',
+                    help='Connect the nodes to their k-nearest neighbors, within a fixed radius or the PRM* radius')
+parser.add_argument('--connection_radius', type=float, metavar='', required=False, default=50,
+                    help='Connection radius in pixels of the radius connection')
+parser.add_argument('--gamma', type=float, metavar='', required=False,
+                    help='Scale in pixels of the PRM* radius gamma * sqrt(log(n) / n)')
+parser.add_argument('--search', type=str, choices=['astar', 'csgraph'], default='astar',
+                    help='Search the roadmap with A* or with scipy.sparse.csgraph Dijkstra')
+parser.add_argument('--collision', type=str, choices=['analytic', 'bitmap'], default='analytic',
+                    help='Collision checks against the obstacle geometry or the occupancy bitmap of the map')
+parser.add_argument('--early_exit', type=bool, action=argparse.BooleanOptionalAction,
+                    metavar='', required=False, default=False,
+                    help='Stop checking edges once start and goal are connected, only the success rate is kept')
+parser.add_argument('--lazy', type=bool, action=argparse.BooleanOptionalAction,
+                    metavar='', required=False, default=False,
+                    help='Check the roadmap edges only when they lie on a candidate path')
+parser.add_argument('--prefix_nodes', type=int, nargs='+', metavar='', required=False,
+                    help='Node counts evaluated in one incremental pass for the prefix sequence samplers')
+parser.add_argument('--multi_query', type=bool, action=argparse.BooleanOptionalAction,
+                    metavar='', required=False, default=False,
+                    help='Build one roadmap per sample set and answer every start/goal pair with it')
+
+# Defaults for the modules importing this one, the command line is parsed under __main__
+args = parser.parse_args([])
+
+
+def check_options(options):
+    # The multi-query planner builds an eager kNN roadmap and searches it
+    # with its own Dijkstra, the other modes would only label its rows
+    if options.multi_query:
+        unsupported = [name for name, used in [('--lazy', options.lazy), ('--early_exit', options.early_exit),
+                                               ('--connection', options.connection != 'knn'),
+                                               ('--search', options.search != 'astar')] if used]
+        if unsupported:
+            parser.error(f'--multi_query cannot be combined with {", ".join(unsupported)}')
+    return options
+
+
+
+def make_renderer(scene, graph_):
+    # pygame is only needed when drawing, the planning runs without a display
+    import render
+
+    renderer = render.Renderer(scene, graph_)
+    renderer.draw_initial_node()
+    renderer.draw_goal_node()
+    if graph_.obstacles != []:
+        renderer.draw_obstacles()
+    return renderer
+
+
+def level_graph(context, x_init, x_goal):
+    # Graph of a run on the compiled obstacles of its level
+    return context.graph(start=x_init, goal=x_goal, lazy=args.lazy, early_exit=args.early_exit,
+                         connection=args.connection, connection_radius=args.connection_radius, gamma=args.gamma,
+                         search_backend=args.search)
+
+
+def run_prm_iteration(distribution, x_init, x_goal, level, rep, points=None):
+    # Obstacles, collision checker and start and goal checks are shared by every run on the level
+    context = scenes.level_context(level, args.radius, args.collision, args.obstacles)
+    graph_ = level_graph(context, x_init, x_goal)
+    configurations = [x_init, x_goal]
+    renderer = make_renderer(context.scene, graph_) if args.draw else None
 
     # Number of the closest neighbors to examine for each configuration
     k = args.k_nearest if args.k_nearest is not None else 15
-    sampling = True
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return None
+    if points is None:
+        points = sampler(n_points=args.nodes, dist=distribution, rep=rep)
+
+    if points is None:
+        return None, None, None, rep, None
+
+    # No roadmap connects a start or goal in collision, the run ends before building one
+    if not context.endpoints_free(x_init, x_goal):
+        stats = {'edge_cache': (0, 0), 'search_stats': {}, 'verdict': 'no_path', 'connection': None}
+        return 0, [], None, None, stats
+
+    free = context.free_configurations(points)
+    if renderer and args.show_random_nodes:
+        for x in free:
+            renderer.draw_random_node(x)
+    configurations.extend(free)
+    cardinality = len(configurations)
+
+    roadmap = graph_.build_roadmap(configurations=configurations, k=k)
+
+    if renderer:
+        for p1, p2 in roadmap.segments().tolist():
+            renderer.draw_local_planner(p1=p1, p2=p2)
+
+    graph_.a_star(nodes=configurations)
+
+    # Calculate path length
+    path_length = 0
+    for i in range(len(graph_.path_coordinates) - 1):
+        path_length += np.linalg.norm(
+            np.array(graph_.path_coordinates[i]) - np.array(graph_.path_coordinates[i + 1]))
+
+    if renderer:
+        renderer.draw_roadmap()
+        renderer.draw_trajectory(keep_roadmap=True, duration=args.duration)
+        renderer.draw_path_to_goal()
 
+    # (hits, misses) of the edge validity cache, misses are the edges actually checked
+    stats = {'edge_cache': (graph_.edge_cache_hits, graph_.edge_cache_misses), 'search_stats': graph_.search_stats,
+             'verdict': graph_.verdict, 'connection': connection_stats(graph_)}
+
+    return path_length, graph_.path_coordinates, cardinality, None, stats
+
+
+def connection_stats(graph_):
+    # Connection rule of the roadmap and the number of directed edges it produced
+    if graph_.roadmap is None:
+        return None
+    n = graph_.roadmap.n_nodes
+    radius = graph_.neighbor_radius(n) if graph_.connection != 'knn' else None
+    return {'mode': graph_.connection, 'radius': radius, 'edges': graph_.roadmap.n_edges}
+
+
+def run_multi_query_iteration(distribution, x_init, x_goal, level, rep, points=None):
+    scene = scenes.load_scene(level)
+    obstacles = scene.obstacle_rects() if args.obstacles else []
+    k = args.k_nearest if args.k_nearest is not None else 15
+
+    if points is None:
         points = sampler(n_points=args.nodes, dist=distribution, rep=rep)
+    if points is None:
+        return [(None, None, None, rep, None)]
+
+    planner_ = planner.MultiQueryPlanner(points, obstacles, scene.map_dimensions, args.radius, k=k,
+                                         collision=args.collision)
+    outcomes = []
+    for start, goal in zip(x_init, x_goal):
+        path_coordinates, path_length = planner_.query(start, goal)
+        graph_ = planner_.graph
+        stats = {'edge_cache': (graph_.edge_cache_hits, graph_.edge_cache_misses), 'search_stats': dict(planner_.stats),
+                 'verdict': 'path' if path_coordinates else 'no_path'}
+        outcomes.append((path_length, path_coordinates, planner_.cardinality, None, stats))
+
+    return outcomes
+
+
+def run_prefix_iteration(distribution, x_init, x_goal, level, node_counts):
+    context = scenes.level_context(level, args.radius, args.collision, args.obstacles)
+    graph_ = level_graph(context, x_init, x_goal)
+    configurations = [x_init, x_goal]
+    k = args.k_nearest if args.k_nearest is not None else 15
+
+    points = sampler(n_points=max(node_counts), dist=distribution)
 
-        if points is None:
-            return None, None, None, rep
-
-        if sampling:
-            for point in points:
-                x = graph_.generate_input_nodes(point)
-                collision_free = graph_.is_free(point=x, obstacles=obstacles)
-                if collision_free:
-                    if args.show_random_nodes:
-                        graph_.draw_random_node(map_=environment_.map)
-                    configurations.append(x)
-            sampling = False
-            cardinality = len(configurations)
-
-        if not sampling and not is_simulation_finished:
-            for configuration in configurations:
-                new_configurations = configurations.copy()
-                new_configurations.remove(configuration)
-                near = graph_.k_nearest(graph=new_configurations, x_rand=configuration, configuration=configuration,
-                                        k=k)
-
-                for i in range(k):
-                    cross_obstacle = graph_.cross_obstacle(configuration1=configuration, configuration2=near[i],
-                                                           map_=environment_.map)
-                    if not cross_obstacle:
-                        graph_.draw_local_planner(p1=configuration, p2=near[i], map_=environment_.map)
-                        nears.append(near[i])
-                        if is_configuration_free:
-                            success_configurations.append(configuration)
-                            is_configuration_free = False
-
-                if nears != []:
-                    success_nears.append(nears)
-                    nears = []
-                is_configuration_free = True
-
-            graph_.a_star(nodes=configurations, map_=environment_.map)
-
-            # Calculate path length
-            path_length = 0
-            for i in range(len(graph_.path_coordinates) - 1):
-                path_length += np.linalg.norm(
-                    np.array(graph_.path_coordinates[i]) - np.array(graph_.path_coordinates[i + 1]))
-
-            is_simulation_finished = True
-
-        if is_simulation_finished:
-            if args.draw:
-                graph_.draw_roadmap(configurations=success_configurations, nears=success_nears, map_=environment_.map, k=k)
-                graph_.draw_trajectory(configurations=success_configurations, nears=success_nears, environment=environment_,
-                                       obstacles=obstacles, k=k, keep_roadmap=True, duration=args.duration)
-                graph_.draw_path_to_goal(map_=environment_.map, environment=environment_, obstacles=obstacles)
-            break
-
-        pygame.display.update()
-
-    return path_length, graph_.path_coordinates, cardinality, None
+    # Every node count extends the roadmap of the previous one with the next samples
+    outcomes = []
+    sampled = 0
+    for n in sorted(node_counts):
+        configurations.extend(context.free_configurations(points[sampled:n]))
+        sampled = n
+
+        hits, misses = graph_.edge_cache_hits, graph_.edge_cache_misses
+        graph_.grow_roadmap(configurations=configurations, k=k)
+        graph_.path_coordinates = []
+        graph_.a_star(nodes=configurations)
+
+        path_length = 0
+        for i in range(len(graph_.path_coordinates) - 1):
+            path_length += np.linalg.norm(
+                np.array(graph_.path_coordinates[i]) - np.array(graph_.path_coordinates[i + 1]))
+
+        # Edge cache counts of this node count only
+        stats = {'edge_cache': (graph_.edge_cache_hits - hits, graph_.edge_cache_misses - misses),
+                 'search_stats': graph_.search_stats, 'verdict': graph_.verdict,
+                 'connection': connection_stats(graph_)}
+        outcomes.append((n, path_length, graph_.path_coordinates, len(configurations), stats))
+
+    return outcomes
+
+
+def prefix_main(samplers, node_counts):
+    level = args.level
+    scene = scenes.load_scene(level)
+    x_init, x_goal = [scene.start], [scene.goal]
+    rows = []
+
+    for distribution in samplers:
+        if distribution not in PREFIX_SAMPLERS:
+            print(f'{distribution} is not a prefix sequence, run it with --nodes instead')
+            continue
+
+        for i in tqdm(range(len(x_init)), desc=f'{distribution} at level {level}, nodes {sorted(node_counts)}'):
+            for n, path_length, path_coordinates, cardinality, stats in run_prefix_iteration(
+                    distribution, x_init[i], x_goal[i], level, node_counts):
+                rows.append(outcome_row(distribution, level, n, 0, i, (path_length, path_coordinates, cardinality,
+                                                                       None, stats), x_init[i], x_goal[i]))
+
+    if args.save:
+        save_rows(rows)
+
+    sys.exit()
+
+
+def outcome_row(distribution, level, nodes, rep, query, outcome, x_init, x_goal, seconds=np.nan):
+    # Row of the results store of the outcome of a query, see results_store.COLUMNS
+    path_length, path_coordinates, cardinality, bs, stats = outcome
+    row = {'level': level, 'nodes': nodes, 'sampler': distribution, 'rep': rep, 'query': query,
+           'radius': args.radius, 'k': args.k_nearest if args.k_nearest is not None else 15,
+           'start': x_init, 'goal': x_goal, 'seconds': seconds, **results_store.run_options(args)}
+    if bs:
+        # The first rep without points is the number of batches of the sampler
+        row['verdict'] = 'exhausted'
+        return row
+    if not stats:
+        row['verdict'] = 'error'
+        return row
+
+    row['verdict'] = stats['verdict']
+    row['success'] = stats['verdict'] in SUCCESS_VERDICTS
+    row['edge_hits'], row['edge_checks'] = stats['edge_cache']
+    for name in results_store.SEARCH_STATS:
+        if name in stats['search_stats']:
+            row[name] = stats['search_stats'][name]
+    if stats.get('connection'):
+        row['edges'] = stats['connection']['edges']
+        if stats['connection']['radius'] is not None:
+            # Radius the nodes were actually connected within, the PRM* one depends on the nodes
+            row['neighbor_radius'] = stats['connection']['radius']
+    if cardinality is not None:
+        row['cardinality'] = cardinality
+    if path_coordinates:
+        # Paths of early exits are not the shortest ones, only the verdict counts
+        if stats['verdict'] != 'connected':
+            row['length'] = path_length
+        row['path'] = path_coordinates
+    return row
+
+
+def save_rows(rows):
+    # Appends the rows to the results store, on read a later row of a query
+    # replaces the earlier one unless overwriting is disabled
+    if not args.overwrite and rows:
+        key = results_store.KEY
+        stored = results_store.store.read(key, latest=False, level=sorted({row['level'] for row in rows}),
+                                          nodes=sorted({row['nodes'] for row in rows}))
+        stored = set(zip(*(stored[column].tolist() for column in key)))
+        rows = [row for row in rows
+                if tuple(row.get(column, results_store.COLUMNS[column][1]) for column in key) not in stored]
+    chunk = results_store.store.append(rows)
+    if chunk:
+        print(f'{len(rows)} results saved to {chunk}')
 
 
 def main(samplers):
-    results = {sampler: {'lengths': [], 'paths': [], 'init_goal_positions': [], 'cardinality': [], 'batch_size': []} for sampler in samplers}
+    rows = []
 
     level = args.level
 
-    x_init, x_goal = [INITIAL[level]['start']], [INITIAL[level]['goal']]
+    scene = scenes.load_scene(level)
+    x_init, x_goal = [scene.start], [scene.goal]
 
 
-    for i in range(len(x_init)):
-        for distribution in samplers:
+    for distribution in samplers:
 
-            assert distribution in SAMPLERS, f'{distribution} is not a valid sampler'
+        assert distribution in SAMPLERS, f'{distribution} is not a valid sampler'
 
-            if distribution in ["mpmc", "mpmc_rand"]:
-                # Check if n_points is valid
-                ns_allowed = [32, 64, 128, 256, 512, 1024]
-                # if args.nodes not in ns_allowed break from the distribution loop
-                if args.nodes not in ns_allowed:
-                    print(f'{distribution} cannot be run with {args.nodes} nodes')
-                    continue
+        if distribution in MPMC_SAMPLERS:
+            # if args.nodes has no point set file break from the distribution loop
+            if args.nodes not in MPMC_NODES:
+                print(f'{distribution} cannot be run with {args.nodes} nodes')
+                continue
 
-            misses = 0
+        misses = 0
+        queries = 0
 
-            reps = 1 if distribution in ["mpmc", "mpmc_seq", "sobol_unscr", "halton_unscr"] else args.reps
+        reps = 1 if distribution in DETERMINISTIC_SAMPLERS else args.reps
 
-            pbar = tqdm(range(reps), desc=f'{distribution} at level {level}')
-            for rep in pbar:
-                try:
-                    path_length, path_coordinates, cardinality, bs = run_prm_iteration(distribution, x_init[i], x_goal[i], level, rep)
-                    if bs:
-                        print(f'{distribution} has batch size {bs}')
-                        results[distribution]['batch_size'].append(bs)
-                        break
-                except:
-                    path_coordinates = None
+        # The points of all the reps at once, in the dtype of the distribution
+        batch = sample_batch(distribution, args.nodes, reps, dtype=None)
 
-                if not path_coordinates:
-                    misses += 1
-                    # print(f'Miss {distribution} at rep {rep} and cardinality {cardinality}')
+        pbar = tqdm(range(reps), desc=f'{distribution} at level {level}')
+        for rep in pbar:
+            points = batch[rep] if batch is not None and rep < len(batch) else None
+            # In multi-query mode one roadmap answers every start/goal pair of the rep
+            start = time.perf_counter()
+            try:
+                if args.multi_query:
+                    outcomes = run_multi_query_iteration(distribution, x_init, x_goal, level, rep, points)
                 else:
-                    results[distribution]['lengths'].append(path_length)
-                    results[distribution]['paths'].append(path_coordinates)
-                    results[distribution]['init_goal_positions'].append((x_init, x_goal))
-                    results[distribution]['cardinality'].append(cardinality)
-                pbar.set_description(f'{distribution} at level {level}, Misses: {misses}/{rep+1}')
+                    outcomes = [run_prm_iteration(distribution, x_init[i], x_goal[i], level, rep, points)
+                                for i in range(len(x_init))]
+            except Exception:
+                outcomes = [(None, None, None, None, None)] * len(x_init)
+            seconds = time.perf_counter() - start
+
+            bs = outcomes[0][3]
+            if bs:
+                print(f'{distribution} has batch size {bs}')
+                rows.append(outcome_row(distribution, level, args.nodes, rep, 0, outcomes[0], x_init[0], x_goal[0]))
+                break
+
+            for i, outcome in enumerate(outcomes):
+                queries += 1
+                rows.append(outcome_row(distribution, level, args.nodes, rep, i, outcome, x_init[i], x_goal[i],
+                                        seconds))
+                if not outcome[1]:
+                    misses += 1
+            pbar.set_description(f'{distribution} at level {level}, Misses: {misses}/{queries}')
 
     if args.save:
-        file = "results/results_" + str(args.nodes) + "_" + str(args.reps) + "_" + str(args.level) + ".npy"
-        exists = os.path.exists(file)
-
-        if exists:
-            old_results = np.load(file, allow_pickle=True).item()
-
-            # keys that are in results but not in old_results
-            new_keys = [key for key in results.keys() if key not in old_results.keys()]
-
-            # keys that are in both results and old_results
-            common_keys = [key for key in results.keys() if key in old_results.keys()]
-            
-            for key in new_keys:
-                # add the key to the old results
-                old_results[key] = results[key]
-                print(f'{key} results added to {file}')
-            if args.overwrite:
-                # overwrite the key in the old results
-                for key in common_keys:
-                    old_results[key] = results[key]
-                    print(f'{key} results overwritten in {file}')
-            np.save(file, old_results)
-        else:
-            np.save(file, results)
-            print(f'Results saved to {file}')
-
-    pygame.quit()
+        save_rows(rows)
+
     sys.exit()
 
 
 if __name__ == '__main__':
+    args = check_options(parser.parse_args())
+
     # samplers = ["uniform", "sobol_scram", "sobol_unscr", "halton_scram", "halton_unscr", "tri_lat", "tri_lat_add", "sukharev", "sukharev_add", "mpmc", "mpmc_rand"]
     # samplers = ["uniform", "sobol_scram", "sobol_rand", "halton_rand", "halton_scram", "tri_lat", "sukharev", "mpmc_rand"]
     # samplers = ["sobol_scram", "sobol_rand", "halton_rand", "halton_scram", "tri_lat", "sukharev"]
@@ -214,5 +357,9 @@ if __name__ == '__main__':
     samplers = ["mpmc_l2bat"]
 
     # samplers = ["mpmc_rand", "uniform"]
-    print(f'This is {args.nodes} nodes and {args.reps} reps at level {args.level}')
-    main(samplers)
+    if args.prefix_nodes:
+        print(f'This is {args.prefix_nodes} nodes incrementally at level {args.level}')
+        prefix_main(PREFIX_SAMPLERS, args.prefix_nodes)
+    else:
+        print(f'This is {args.nodes} nodes and {args.reps} reps at level {args.level}')
+        main(samplers)
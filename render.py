@@ -0,0 +1,196 @@
+# Optional pygame rendering of the environment and of a graph. The planning
+# modules never import pygame, only the interactive and drawing code does.
+
+import hashlib
+import os
+
+import pygame
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+GRAY = (105, 105, 105)
+
+
+# Static obstacle layers, rendered once per map geometry
+_layers = {}
+
+
+def map_hash(environment, start, goal):
+    '''Content hash of the map size, the obstacles and the start and goal drawn on the map.'''
+    content = (environment.WIDTH, environment.HEIGHT, environment.obstacle_rects(),
+               None if start is None else tuple(start), None if goal is None else tuple(goal))
+    return hashlib.sha1(repr(content).encode()).hexdigest()
+
+
+def obstacle_layer(environment):
+    '''
+    Surface of the obstacles, transparent elsewhere, cached per map geometry.
+
+    Blitting it draws exactly what drawing every side would, for the cost
+    of a single copy.
+    '''
+    key = (environment.WIDTH, environment.HEIGHT, tuple(environment.obstacle_rects()))
+    if key not in _layers:
+        layer = pygame.Surface((environment.WIDTH, environment.HEIGHT))
+        layer.fill(WHITE)
+        for side in environment.obstacle_rects():
+            pygame.draw.rect(layer, GRAY, side)
+        layer.set_colorkey(WHITE)
+        if pygame.display.get_surface() is not None:
+            layer = layer.convert()
+        _layers[key] = layer
+
+    return _layers[key]
+
+
+def save_map(environment, file, start=None, goal=None):
+    '''
+    Saves the obstacles of a level with its start and goal positions as an image.
+
+    The map is drawn on an off-screen surface, so no display is needed. The
+    hash of the map is kept next to the image, which is only written again
+    when the hash changes.
+
+    Parameters
+    ----------
+    environment : environment.Environment
+        Environment whose obstacles are made.
+    file : str
+        Image file to write.
+    start, goal : tuple
+        Start and goal positions drawn on the map, none when not given.
+
+    Returns
+    -------
+    bool
+        Whether the image was written.
+    '''
+    digest = map_hash(environment, start, goal)
+    sidecar = file + '.sha1'
+    if os.path.exists(file) and os.path.exists(sidecar):
+        with open(sidecar) as f:
+            if f.read().strip() == digest:
+                return False
+
+    map_ = pygame.Surface((environment.WIDTH, environment.HEIGHT))
+    map_.fill(WHITE)
+    for obstacle in environment.obstacle_rects():
+        pygame.draw.rect(map_, GRAY, obstacle)
+
+    # add the start and goal positions
+    if start is not None:
+        pygame.draw.circle(map_, GREEN, start, 5)
+    if goal is not None:
+        pygame.draw.circle(map_, RED, goal, 5)
+    pygame.image.save(map_, file)
+    with open(sidecar, 'w') as f:
+        f.write(digest + '\n')
+    return True
+
+
+class Renderer:
+    '''
+    Draws an environment and the roadmap, path and robot of a graph on the display.
+
+    Attributes
+    ----------
+    environment : environment.Environment
+        Map whose obstacles are drawn.
+    graph : graph.Graph
+        Graph whose nodes, roadmap and path are drawn.
+    '''
+
+    def __init__(self, environment, graph):
+        pygame.init()
+        self.environment = environment
+        self.graph = graph
+        self.FPS = 120
+        pygame.display.set_caption('PRM')
+        self.map = pygame.display.set_mode((environment.WIDTH, environment.HEIGHT))
+        self.map.fill(WHITE)
+        self.map_saved = False
+
+    def draw_obstacles(self):
+        '''Draw the obstacles, and save the map of the level with the start and goal of the graph once.'''
+        self.map.blit(obstacle_layer(self.environment), (0, 0))
+        if not self.map_saved:
+            save_map(self.environment, 'results/maps/map_level_' + str(self.environment.level) + '.png',
+                     self.graph.x_init, self.graph.x_goal)
+            self.map_saved = True
+
+    def draw_path_to_goal(self):
+        '''Draws the path from the x_goal node to the x_init node.'''
+        self.draw_initial_node()
+        self.draw_goal_node()
+
+        if self.graph.obstacles != []:
+            self.draw_obstacles()
+
+        path_coordinates = self.graph.path_coordinates
+        for i in range(len(path_coordinates)-1):
+            pygame.draw.line(surface=self.map, color=RED, start_pos=path_coordinates[i],
+                             end_pos=path_coordinates[i+1], width=4)
+
+        self.refresh_screen(seconds=3)
+
+    def draw_random_node(self, point):
+        '''Draws a sampled node.'''
+        pygame.draw.circle(surface=self.map, color=GREEN, center=point, radius=self.graph.robot_radius, width=0)
+
+    def draw_initial_node(self):
+        '''Draws the x_init node.'''
+        return pygame.draw.circle(surface=self.map, color=BLUE, center=self.graph.x_init,
+                                  radius=self.graph.robot_radius)
+
+    def draw_goal_node(self):
+        '''Draws the x_goal node.'''
+        return pygame.draw.circle(surface=self.map, color=RED, center=self.graph.x_goal,
+                                  radius=self.graph.robot_radius)
+
+    def draw_local_planner(self, p1, p2):
+        '''Draws the local planner from node to node.'''
+        pygame.draw.line(surface=self.map, color=BLACK, start_pos=p1, end_pos=p2)
+
+    def move_robot(self, position):
+        '''Draws the robot moving at the given position.'''
+        pygame.draw.circle(surface=self.map, color=BLUE, center=position, radius=self.graph.robot_radius)
+
+    def draw_roadmap(self):
+        '''Draws the roadmap constantly. Used to display it in an infinite loop.'''
+        self.draw_initial_node()
+        self.draw_goal_node()
+
+        for p1, p2 in self.graph.roadmap.segments(valid_only=False).tolist():
+            self.draw_local_planner(p1=p1, p2=p2)
+
+    def refresh_screen(self, seconds):
+        '''Updates the screen information and waits the given seconds.'''
+        seconds = int(seconds * 100)
+
+        # Refresh the screen
+        pygame.event.pump()
+        pygame.display.update()
+        pygame.time.delay(seconds)
+        self.map.fill(WHITE)
+
+    def draw_trajectory(self, keep_roadmap, duration=0.02):
+        '''Draws the robot moving in the map.'''
+        if not hasattr(self.graph, 'smooth'):
+            return
+        for robot_position in self.graph.smooth:
+            if self.graph.obstacles != []:
+                self.draw_obstacles()
+
+            if keep_roadmap:
+                self.draw_roadmap()
+
+            # Draw initial and final robot configuration constantly
+            self.draw_initial_node()
+            self.draw_goal_node()
+
+            # Draw path to goal, and the robot movement constantly
+            self.move_robot(position=robot_position)
+            self.refresh_screen(seconds=duration)
@@ -0,0 +1,228 @@
+# Append-only store of the planning results, one row per query. Every append
+# writes a new chunk directory with one .npy file per column, built under a
+# temporary name and renamed into place, so any number of processes can write
+# at once and readers never see a partial chunk. Columns are memory-mapped
+# on read, only the ones asked for are touched.
+
+import itertools
+import os
+import time
+
+import numpy as np
+
+# Directory of the chunks, results/store in the repository by default
+STORE_ROOT = os.environ.get('PRM_RESULTS_STORE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'store'))
+
+# Columns of a row with their dtype and the value of a row that leaves them out
+COLUMNS = {'level': (np.int16, -1),
+           'nodes': (np.int32, -1),
+           'sampler': ('<U16', ''),
+           'rep': (np.int32, -1),
+           'query': (np.int32, 0),
+           'radius': (np.int32, -1),
+           'k': (np.int32, -1),
+           'connection': ('<U8', ''),
+           'connection_radius': (np.float64, -1),
+           'gamma': (np.float64, -1),
+           'obstacles': (np.bool_, False),
+           'collision': ('<U8', 'analytic'),
+           'lazy': (np.bool_, False),
+           'early_exit': (np.bool_, False),
+           'search': ('<U8', 'astar'),
+           'multi_query': (np.bool_, False),
+           'prefix': (np.bool_, False),
+           'seed': (np.int64, -1),
+           'verdict': ('<U16', ''),
+           'success': (np.bool_, False),
+           'length': (np.float64, np.nan),
+           'cardinality': (np.int32, -1),
+           'edge_hits': (np.int64, -1),
+           'edge_checks': (np.int64, -1),
+           'edges': (np.int64, -1),
+           'neighbor_radius': (np.float64, np.nan),
+           'expanded': (np.int64, -1),
+           'pushed': (np.int64, -1),
+           'stale': (np.int64, -1),
+           'relaxed': (np.int64, -1),
+           'replans': (np.int64, -1),
+           'checks_avoided': (np.int64, -1),
+           'reached': (np.int64, -1),
+           'seconds': (np.float64, np.nan),
+           'start': (np.int32, (-1, -1)),
+           'goal': (np.int32, (-1, -1))}
+
+# Counts of the search of a run, see graph.Graph.a_star, the ones a search
+# backend does not keep are left out
+SEARCH_STATS = ['expanded', 'pushed', 'stale', 'relaxed', 'replans', 'checks_avoided', 'reached']
+
+# Planner options of a run, see run_options
+OPTIONS = ['connection', 'connection_radius', 'gamma', 'obstacles', 'collision', 'lazy', 'early_exit', 'search',
+           'multi_query', 'prefix']
+
+# Columns identifying a query, a later row with the same ones replaces an earlier one
+KEY = ['level', 'nodes', 'sampler', 'radius', 'k'] + OPTIONS + ['seed', 'rep', 'query']
+
+# Ragged path column, the points of row i are points[offsets[i]:offsets[i + 1]]
+PATH_OFFSETS = 'path_offsets'
+PATH_POINTS = 'path_points'
+
+# Chunks appended by this process
+_counter = itertools.count()
+
+
+def run_options(args):
+    '''
+    Values of the OPTIONS columns of the runs made with the given options.
+
+    The connection radius is only kept for the 'radius' connection and gamma
+    for a 'prm_star' connection given one, -1 otherwise, so options a run
+    does not use never tell two runs apart. Rows of the incremental prefix
+    passes are told apart from the ones of a single node count, their edge
+    counts only cover the edges added at their node count.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Options named as the ones of prm_vs_samplers.
+
+    Returns
+    -------
+    dict
+    '''
+    return {'connection': args.connection,
+            'connection_radius': args.connection_radius if args.connection == 'radius' else -1,
+            'gamma': args.gamma if args.connection == 'prm_star' and args.gamma is not None else -1,
+            'obstacles': bool(args.obstacles), 'collision': args.collision, 'lazy': bool(args.lazy),
+            'early_exit': bool(args.early_exit), 'search': args.search, 'multi_query': bool(args.multi_query),
+            'prefix': bool(args.prefix_nodes)}
+
+
+class ResultsStore:
+    '''
+    Rows of results appended in chunks and read back column by column.
+
+    Attributes
+    ----------
+    root : str
+        Directory of the chunks.
+    '''
+
+    def __init__(self, root=None):
+        self.root = root if root is not None else STORE_ROOT
+
+    def append(self, rows):
+        '''
+        Writes rows as a new chunk.
+
+        Parameters
+        ----------
+        rows : list
+            Dicts of column values, see COLUMNS, and the 'path' of the row
+            as a list of (x, y) points, empty or None without a path.
+
+        Returns
+        -------
+        str
+            Directory of the chunk, None when there are no rows.
+        '''
+        if not rows:
+            return None
+
+        # Chunk names sort in the order they were written
+        name = f'chunk_{time.time_ns():020d}_{os.getpid()}_{next(_counter):06d}'
+        os.makedirs(self.root, exist_ok=True)
+        temporary = os.path.join(self.root, '.' + name)
+        os.makedirs(temporary)
+
+        for column, (dtype, default) in COLUMNS.items():
+            values = np.array([row.get(column, default) for row in rows], dtype=dtype)
+            np.save(os.path.join(temporary, column + '.npy'), values)
+
+        paths = [np.asarray(row.get('path') or [], dtype=np.int32).reshape(-1, 2) for row in rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(path) for path in paths], out=offsets[1:])
+        np.save(os.path.join(temporary, PATH_OFFSETS + '.npy'), offsets)
+        np.save(os.path.join(temporary, PATH_POINTS + '.npy'), np.concatenate(paths))
+
+        chunk = os.path.join(self.root, name)
+        os.rename(temporary, chunk)
+        return chunk
+
+    def chunks(self):
+        '''Directories of the complete chunks, oldest first.'''
+        if not os.path.isdir(self.root):
+            return []
+        return [os.path.join(self.root, name) for name in sorted(os.listdir(self.root)) if name.startswith('chunk_')]
+
+    def column(self, chunk, column, n_rows):
+        '''Memory-mapped column of a chunk, the default value for chunks written before it existed.'''
+        file = os.path.join(chunk, column + '.npy')
+        if not os.path.exists(file):
+            dtype, default = COLUMNS[column]
+            return np.full((n_rows,) + np.shape(default), default, dtype=dtype)
+        return np.load(file, mmap_mode='r')
+
+    def read(self, columns, latest=True, **where):
+        '''
+        Columns of the rows matching the given values.
+
+        Parameters
+        ----------
+        columns : list
+            Columns to read, see COLUMNS, and 'path' for the paths.
+        latest : bool
+            Keeps only the last written row of every query, see KEY.
+        **where
+            Column values the rows must have, a list for any of several
+            values.
+
+        Returns
+        -------
+        dict
+            Array of every column, in the order the rows were written.
+            Paths are a list of arrays of shape (m, 2).
+        '''
+        needed = list(dict.fromkeys(list(columns) + list(where) + (KEY if latest else [])))
+        parts = {column: [] for column in needed}
+        for chunk in self.chunks():
+            n_rows = len(np.load(os.path.join(chunk, PATH_OFFSETS + '.npy'), mmap_mode='r')) - 1
+            data = {column: self.column(chunk, column, n_rows) for column in needed if column != 'path'}
+            mask = np.ones(n_rows, dtype=bool)
+            for column, value in where.items():
+                mask &= np.isin(data[column], np.atleast_1d(value))
+            if not mask.any():
+                continue
+
+            rows = np.flatnonzero(mask)
+            for column in needed:
+                if column == 'path':
+                    offsets = np.load(os.path.join(chunk, PATH_OFFSETS + '.npy'), mmap_mode='r')
+                    points = np.load(os.path.join(chunk, PATH_POINTS + '.npy'), mmap_mode='r')
+                    parts[column].extend(np.array(points[offsets[i]:offsets[i + 1]]) for i in rows)
+                else:
+                    parts[column].append(data[column][rows])
+
+        result = {}
+        for column in needed:
+            if column == 'path':
+                result[column] = parts[column]
+            elif parts[column]:
+                result[column] = np.concatenate(parts[column])
+            else:
+                dtype, default = COLUMNS[column]
+                result[column] = np.empty((0,) + np.shape(default), dtype=dtype)
+
+        if latest:
+            last = {}
+            for i, key in enumerate(zip(*(result[column].tolist() for column in KEY))):
+                last[key] = i
+            keep = np.array(sorted(last.values()), dtype=np.int64)
+            result = {column: [values[i] for i in keep] if column == 'path' else values[keep]
+                      for column, values in result.items()}
+
+        return {column: result[column] for column in columns}
+
+
+# Store shared by the runs
+store = ResultsStore()
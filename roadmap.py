@@ -0,0 +1,278 @@
+# Array-backed storage of a probabilistic roadmap: node coordinates in one
+# contiguous array and the directed neighbor lists in CSR form.
+
+import numpy as np
+
+# Validity of an undirected edge
+UNKNOWN = -1
+INVALID = 0
+VALID = 1
+
+
+def truncated_distance(p1, p2):
+    '''Euclidean distance truncated to an integer, as Graph.euclidean_distance.'''
+    delta = np.asarray(p1, dtype=np.float64) - np.asarray(p2, dtype=np.float64)
+    return np.floor(np.sqrt((delta**2).sum(axis=-1)))
+
+
+def radius_neighbors(coordinates, radius):
+    '''
+    Neighbors of every node within a connection radius.
+
+    The nodes are hashed into a uniform grid of cells as wide as the radius,
+    so every node is only compared with the nodes of the 3 x 3 cells around
+    its own.
+
+    Parameters
+    ----------
+    coordinates : array_like
+        Node centers of shape (n, 2).
+    radius : float
+        Connection radius, neighbors lie at a distance of at most radius.
+
+    Returns
+    -------
+    tuple
+        CSR offsets of shape (n + 1,) and neighbor indices of every node,
+        nearest first and ties resolved towards the lowest index.
+    '''
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(coordinates)
+    if n == 0 or radius <= 0:
+        return np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    cells = np.floor(coordinates / radius).astype(np.int64)
+    cells -= cells.min(axis=0)
+    nx, ny = cells.max(axis=0) + 1
+    order = np.argsort(cells[:, 1] * nx + cells[:, 0], kind='stable')
+    buckets = np.zeros(nx * ny + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells[:, 1] * nx + cells[:, 0], minlength=nx * ny), out=buckets[1:])
+
+    sources, targets = [], []
+    for ox in (-1, 0, 1):
+        for oy in (-1, 0, 1):
+            cx, cy = cells[:, 0] + ox, cells[:, 1] + oy
+            node = np.flatnonzero((cx >= 0) & (cx < nx) & (cy >= 0) & (cy < ny))
+            cell = cy[node] * nx + cx[node]
+            counts = buckets[cell + 1] - buckets[cell]
+            source = np.repeat(node, counts)
+            first = np.repeat(buckets[cell] - (np.cumsum(counts) - counts), counts)
+            target = order[np.arange(counts.sum()) + first]
+            delta = coordinates[source] - coordinates[target]
+            keep = (source != target) & ((delta**2).sum(axis=1) <= radius**2)
+            sources.append(source[keep])
+            targets.append(target[keep])
+
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    distances = ((coordinates[sources] - coordinates[targets])**2).sum(axis=1)
+    order = np.lexsort((targets, distances, sources))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets[order]
+
+
+class Roadmap:
+    '''
+    A compact roadmap of n nodes and their directed neighbor lists.
+
+    The neighbors of node i are indices[indptr[i]:indptr[i+1]]. Both
+    directions of a connection share one undirected edge, so its validity
+    is stored, and computed, only once.
+
+    Attributes
+    ----------
+    coordinates : numpy.ndarray
+        Node centers of shape (n, 2), float32.
+    indptr : numpy.ndarray
+        CSR offsets of shape (n + 1,).
+    indices : numpy.ndarray
+        Target node of every directed edge, shape (e,).
+    weights : numpy.ndarray
+        Length of every directed edge, shape (e,), float32.
+    edge_ids : numpy.ndarray
+        Undirected edge of every directed edge, shape (e,).
+    pairs : numpy.ndarray
+        Sorted node pair of every undirected edge, shape (u, 2).
+    validity : numpy.ndarray
+        UNKNOWN, INVALID or VALID for every undirected edge, shape (u,), int8.
+    '''
+
+    def __init__(self, coordinates, indptr, indices):
+        self.coordinates = np.ascontiguousarray(coordinates, dtype=np.float32).reshape(-1, 2)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+
+        self.sources = np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr))
+        self.weights = truncated_distance(self.coordinates[self.sources],
+                                          self.coordinates[self.indices]).astype(np.float32)
+
+        # Both directions of a connection map to the same undirected edge
+        low = np.minimum(self.sources, self.indices).astype(np.int64)
+        high = np.maximum(self.sources, self.indices).astype(np.int64)
+        keys, edge_ids = np.unique(low * self.n_nodes + high, return_inverse=True)
+        self.edge_ids = edge_ids.ravel().astype(np.int32)
+        self.pairs = np.stack([keys // self.n_nodes, keys % self.n_nodes], axis=1).astype(np.int32)
+        self.validity = np.full(len(self.pairs), UNKNOWN, dtype=np.int8)
+        self._lists = None
+
+    @classmethod
+    def from_neighbors(cls, coordinates, neighbors):
+        '''
+        Builds a roadmap from a fixed number of neighbors per node.
+
+        Parameters
+        ----------
+        coordinates : array_like
+            Node centers of shape (n, 2).
+        neighbors : numpy.ndarray
+            Neighbor indices of shape (n, k), e.g. from Graph.k_nearest_all.
+
+        Returns
+        -------
+        Roadmap
+        '''
+        neighbors = np.asarray(neighbors)
+        n, k = neighbors.shape
+        return cls(coordinates, np.arange(n + 1) * k, neighbors.ravel())
+
+    def inherit_validity(self, other):
+        '''
+        Copies the known validity of the edges shared with another roadmap.
+
+        The nodes of the other roadmap must be a prefix of the nodes of this
+        one, as when a roadmap is grown with new samples.
+        '''
+        keys = self.pairs[:, 0].astype(np.int64) * self.n_nodes + self.pairs[:, 1]
+        other_keys = other.pairs[:, 0].astype(np.int64) * self.n_nodes + other.pairs[:, 1]
+        position = np.minimum(np.searchsorted(keys, other_keys), len(keys) - 1)
+        shared = keys[position] == other_keys
+        self.validity[position[shared]] = other.validity[shared]
+
+    @property
+    def n_nodes(self):
+        return len(self.coordinates)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        '''Memory used by the roadmap arrays in bytes.'''
+        arrays = [self.coordinates, self.indptr, self.indices, self.sources, self.weights,
+                  self.edge_ids, self.pairs, self.validity]
+        return sum(array.nbytes for array in arrays)
+
+    @property
+    def valid(self):
+        '''Boolean mask of the directed edges known to be collision free.'''
+        return self.validity[self.edge_ids] == VALID
+
+    def as_lists(self):
+        '''
+        Python lists of indptr, indices, weights, edge_ids and coordinates.
+
+        Element access on lists is much cheaper than on arrays in the
+        search loops, the lists are built once and shared by all searches.
+        '''
+        if self._lists is None:
+            self._lists = (self.indptr.tolist(), self.indices.tolist(), self.weights.tolist(),
+                           self.edge_ids.tolist(), self.coordinates.tolist())
+        return self._lists
+
+    def neighbors(self, node):
+        '''Slice of the directed edges leaving the given node.'''
+        return slice(self.indptr[node], self.indptr[node + 1])
+
+    def path_edges(self, path):
+        '''Undirected edge ids joining consecutive nodes of a path.'''
+        edges = []
+        for u, v in zip(path[:-1], path[1:]):
+            offset = np.flatnonzero(self.indices[self.neighbors(u)] == v)[0]
+            edges.append(self.edge_ids[self.indptr[u] + offset])
+        return np.array(edges, dtype=np.int32)
+
+    def center(self, node):
+        '''Center of a node as a tuple of ints.'''
+        x, y = self.coordinates[node]
+        return int(x), int(y)
+
+    def segments(self, valid_only=True):
+        '''
+        End points of the directed edges, e.g. for drawing.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (m, 2, 2) holding start and end of every edge.
+        '''
+        mask = self.valid if valid_only else slice(None)
+        return np.stack([self.coordinates[self.sources[mask]], self.coordinates[self.indices[mask]]], axis=1)
+
+    def to_csr(self, valid_only=True):
+        '''
+        Weighted adjacency matrix of the roadmap as a scipy.sparse.csr_matrix.
+
+        All directed edges share the roadmap arrays without copying, while
+        valid_only keeps the edges known to be collision free.
+        '''
+        from scipy.sparse import csr_matrix
+
+        shape = (self.n_nodes, self.n_nodes)
+        if not valid_only:
+            return csr_matrix((self.weights, self.indices, self.indptr), shape=shape)
+
+        mask = self.valid
+        indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources[mask], minlength=self.n_nodes), out=indptr[1:])
+        return csr_matrix((self.weights[mask], self.indices[mask], indptr), shape=shape)
+
+
+class UnionFind:
+    '''
+    Connected components of the roadmap nodes, merged as edges are found free.
+
+    Union by size with path halving, so keeping the components up to date
+    costs almost constant time per validated edge.
+
+    Attributes
+    ----------
+    n : int
+        Number of nodes.
+    '''
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.n_components = n
+
+    def find(self, node):
+        '''Representative node of the component of the given node.'''
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a, b):
+        '''Merges the components of two nodes, returns whether they were apart.'''
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.n_components -= 1
+        return True
+
+    def union_pairs(self, pairs):
+        '''Merges the components joined by every (a, b) row of an array of node pairs.'''
+        for a, b in np.asarray(pairs).reshape(-1, 2).tolist():
+            self.union(a, b)
+
+    def connected(self, a, b):
+        '''Checks if two nodes are in the same component.'''
+        return self.find(a) == self.find(b)
@@ -1,29 +1,9 @@
 #!/bin/bash
 
-# Loop over the values of nodes
-# for nodes in 16 22 28 32 40 50 57 64 75 91 113 128 150 181 216 256 302 362 432 512 603 724 868 1024 ; do
-for nodes in 32 64 128 256 512 1024 ; do
-    # Loop over the values of level
-    for level in 1; do
-        # Run the command with the current values of nodes and level
-        python prm_vs_samplers.py --obstacles --nodes $nodes --level $level -s --radius 6 --reps 50
-    done
-done
+# Maps of every level, shown by the analysis plots
+python environment.py
 
-# Loop over the values of nodes
-for nodes in 32 64 128 256 512 1024 ; do
-    # Loop over the values of level
-    for level in 2; do
-        # Run the command with the current values of nodes and level
-        python prm_vs_samplers.py --obstacles --nodes $nodes --level $level -s --radius 6 --reps 50
-    done
-done
-
-# Loop over the values of nodes
-for nodes in 64 128 256 512 1024 ; do
-    # Loop over the values of level
-    for level in 3; do
-        # Run the command with the current values of nodes and level
-        python prm_vs_samplers.py --obstacles --nodes $nodes --level $level -s --radius 6 --reps 50
-    done
-done
+# Every rep of mpmc_l2bat at every level, spread over all the cores. A rerun
+# after a crash only runs what is missing from the results store
+python sweep.py --obstacles --levels 1 2 --nodes 32 64 128 256 512 1024 --samplers mpmc_l2bat -s --resume --radius 6 --reps 50
+python sweep.py --obstacles --levels 3 --nodes 64 128 256 512 1024 --samplers mpmc_l2bat -s --resume --radius 6 --reps 50
@@ -2,13 +2,15 @@
 # distributions include: uniform, sobol, and custom mpmc
 
 import numpy as np
-import torch
-import matplotlib.pyplot as plt
-from scipy.stats.qmc import discrepancy as L2discrepancy
-from scipy.stats import qmc
-import os
+
+import pointsets
+
+# scipy.stats is only imported by the QMC and discrepancy paths, and
+# matplotlib by the plots of the __main__ demo
 
 def get_best_batch_id(data, nsamples):
+    from scipy.stats.qmc import discrepancy as L2discrepancy
+
     nb = int(data.shape[0] / nsamples)
     discs = []
     for batch_id in range(nb):
@@ -19,248 +21,271 @@ def get_best_batch_id(data, nsamples):
 
     return arg, discs[arg]
 
+# Grids of the lattice samplers, per distribution and number of points
+_lattices = {}
+
+def lattice(dist, n_points):
+    # Grid points of tri_lat, tri_lat_add, sukharev and sukharev_add before
+    # trimming or augmenting them, built once and kept read-only
+    key = (dist, n_points)
+    if key not in _lattices:
+        if dist in ["tri_lat", "tri_lat_add"]:
+            # smallest square grid that can fit n_points for tri_lat, largest one within n_points otherwise
+            if dist == "tri_lat":
+                n_side = int(np.ceil(np.sqrt(n_points)))
+            else:
+                n_side = int(np.floor(np.sqrt(n_points)))
+
+            # Set y_spacing to span the full height with n_side points
+            y_spacing = 1 / n_side
+            # Calculate x_spacing to maintain the sqrt(3)/2 ratio
+            x_spacing = y_spacing / (np.sqrt(3) / 2)
+
+            i, j = np.meshgrid(np.arange(n_side), np.arange(n_side), indexing='ij')
+            i, j = i.ravel(), j.ravel()
+            x_coord = i * x_spacing
+            # Shift every other row by half the x_spacing
+            x_coord = np.where(j % 2 == 1, x_coord + 0.5 * x_spacing, x_coord)
+            y_coord = j * y_spacing
+
+            # Only include points within the unit square
+            within = (x_coord <= 1) & (y_coord <= 1)
+            x = np.stack([x_coord[within], y_coord[within]], axis=1)
+
+            # shift all the values up by half the spacing at the top
+            x[:,1] += (1 - max(x[:,1]))/2
+            # shift all the values to the right by half the spacing at the right
+            x[:,0] += (1 - max(x[:,0]))/2
+
+        elif dist in ["sukharev", "sukharev_add"]:
+            if dist == "sukharev":
+                n = np.ceil(np.sqrt(n_points))
+            else:
+                n = int(np.sqrt(n_points))
+
+            i, j = np.meshgrid(np.arange(int(n)), np.arange(int(n)), indexing='ij')
+            x = np.stack([i.ravel() / n, j.ravel() / n], axis=1)
+            # shift by half the spacing in the x and y directions
+            x += 1/(2*n)
+
+        else:
+            raise ValueError(f"Invalid lattice distribution: {dist}")
+
+        x.setflags(write=False)
+        _lattices[key] = x
+
+    return _lattices[key]
+
+def augment(x, n_points, steps, inside, unit, rng=np.random, chunk=256):
+    # Adds random points generated so far, the added ones included, shifted by
+    # a random step until there are n_points. Every point is hashed by its
+    # integer position on a lattice of the given unit, which finds the
+    # duplicates in constant time, and the random draws are made in chunks.
+    points = x.tolist()
+    ox, oy = points[0]
+    ux, uy = unit
+    keys = {(round((px - ox) / ux), round((py - oy) / uy)) for px, py in points}
+
+    while len(points) < n_points:
+        draws = rng.random((chunk, 2)).tolist()
+        for draw, choice in draws:
+            px, py = points[int(draw * len(points))]
+            dx, dy = steps[int(choice * len(steps))]
+            new_point = (px + dx, py + dy)
+            if inside(new_point):
+                key = (round((new_point[0] - ox) / ux), round((new_point[1] - oy) / uy))
+                if key not in keys:
+                    keys.add(key)
+                    points.append(new_point)
+                    if len(points) == n_points:
+                        break
+
+    return np.array(points)
+
+def grow(dist, n_points, rng=np.random):
+    # Lattice of tri_lat_add or sukharev_add augmented to n_points
+    x = lattice(dist, n_points)
+    if dist == "tri_lat_add":
+        n_side = int(np.floor(np.sqrt(n_points)))
+        y_spacing = 1 / n_side
+        x_spacing = y_spacing / (np.sqrt(3) / 2)
+
+        # Generate the remaining points by shifting random points generated so far by 2/3 of
+        # the y_spacing up or down, the shifted points lie on a lattice of x_spacing/2 by y_spacing/3
+        steps = [(0, pmy * 2 * y_spacing / 3) for pmy in (-1, 1)]
+        inside = lambda p: 0 <= p[0] <= 1 and 0 <= p[1] <= 1
+        return augment(x, n_points, steps, inside, unit=(x_spacing / 2, y_spacing / 3), rng=rng)
+
+    n = int(np.sqrt(n_points))
+
+    # add the remaining points by shifting random points generated so far by half the spacing
+    # in both directions, the shifted points lie on a lattice of half the spacing
+    steps = [(pmx * 1/(2*n), pmy * 1/(2*n)) for pmx in (-1, 1) for pmy in (-1, 1)]
+    inside = lambda p: 0 < p[0] < 1 and 0 < p[1] < 1
+    return augment(x, n_points, steps, inside, unit=(1/(2*n), 1/(2*n)), rng=rng)
+
+def rotate(x):
+    # rotate all point by 10*pi/180
+    theta = 10 * np.pi / 180
+    rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    x = np.dot(x, rot)
+    # bring all points back to the unit square
+    return x % 1
+
+# Engines of sobol_batch and halton_batch per number of points, with the
+# batch they produce next
+_engines = {}
+
+def qmc_batch(dist, n_points, rep, reps=1):
+    # Batches rep, ..., rep + reps - 1 of n_points of the unscrambled Sobol or
+    # Halton sequence, one after the other. Consecutive batches are drawn from
+    # one engine per distribution and n_points, any other batch resets the
+    # engine and jumps to its start. sobol_batch skips the first point of the
+    # sequence.
+    key = (dist, n_points)
+    if key not in _engines:
+        from scipy.stats import qmc
+
+        if dist == "sobol_batch":
+            _engines[key] = [qmc.Sobol(2, scramble=False), 1, None]
+        else:
+            _engines[key] = [qmc.Halton(d=2, scramble=False), 0, None]
+
+    engine, offset, next_rep = _engines[key]
+    if rep != next_rep:
+        engine.reset()
+        engine.fast_forward(rep*n_points + offset)
+    x = engine.random(n_points * reps)
+    _engines[key][2] = rep + reps
+    return x
+
+def base_points(dist, n_points):
+    # The single point set of sobol_unscr, halton_unscr, mpmc and mpmc_seq,
+    # which the *_rand distributions translate
+    if dist == "sobol_unscr":
+        from scipy.stats import qmc
+        return qmc.Sobol(2, scramble=False).random(n_points)
+    if dist == "halton_unscr":
+        from scipy.stats import qmc
+        return qmc.Halton(2, scramble=False).random(n_points)
+    if dist == "mpmc":
+        b_id, _ = pointsets.store.best_batch("mpmc", n_points)
+        return pointsets.store.batch("mpmc", n_points, b_id)
+    if dist == "mpmc_seq":
+        return pointsets.store.array("ordered", 1024)[:n_points]
+    raise ValueError(f"Invalid deterministic distribution: {dist}")
+
+def stream(n_points = 32, dist = "uniform", start=0):
+    # Generator of the batches of reps start, start + 1, ... of a distribution,
+    # ends where the distribution has no more batches
+    rep = start
+    while True:
+        x = sampler(n_points=n_points, dist=dist, rep=rep)
+        if x is None:
+            return
+        yield x
+        rep += 1
+
 def sampler(n_points = 32, dist = "uniform", rep=0):
+    # Points of rep of a distribution, drawn by its batched sampler with the
+    # global numpy random state and in the dtype of the distribution. MPMC
+    # batches are read-only views of the memory-mapped point sets. None when
+    # the distribution has no such rep.
+    x = sample_batch(dist, n_points, 1, start=rep, dtype=None)
+    if x is None:
+        return None
+    return x[0]
+
+
+# Batched samplers of the distributions, see register
+BATCH_SAMPLERS = {}
+
+def register(*dists):
+    # Decorator making f(dist, n_points, reps, rng, start) the batched sampler
+    # of the given distributions. It returns the points of reps start, ...,
+    # start + reps - 1 as an array of shape (reps, n_points, 2), or the reps
+    # left when the distribution has fewer batches. sampler draws single reps
+    # through it as well.
+    def decorator(f):
+        for dist in dists:
+            BATCH_SAMPLERS[dist] = f
+        return f
+    return decorator
+
+def sample_batch(dist, n_points, reps, rng=None, start=0, dtype=np.float32):
+    # Points of reps start, ..., start + reps - 1 of a distribution as one
+    # contiguous array of shape (reps, n_points, 2), float32 unless another
+    # dtype is given, None to keep the one of the distribution. Random draws
+    # come from rng, a numpy Generator or RandomState, or the global numpy
+    # random state. Distributions with a limited number of batches return the
+    # ones left, None when there are none.
     if dist in ["mpmc", "mpmc_rand", "mpmc_batch", "mpmc_l2bat"]:
         # Check if n_points is valid
         ns_allowed = [32, 64, 128, 256, 512, 1024]
         assert n_points in ns_allowed, f"n_points must be one of {ns_allowed} for {dist} distribution"
 
-    if dist == "uniform":
-        x = np.random.rand(n_points, 2)
-
-    elif dist == "sobol_scram":
-        x = qmc.Sobol(2, scramble=True).random(n_points)
-
-    elif dist == "sobol_unscr":
-        x = qmc.Sobol(2, scramble=False).random(n_points)
-
-    elif dist == "sobol_batch":
-        sobol_sampler = qmc.Sobol(2, scramble=False)
-        sobol_sampler.fast_forward(rep*n_points + 1)
-        x = sobol_sampler.random(n_points)
-
-
-    elif dist == "sobol_rand":
-        x = qmc.Sobol(2, scramble=False).random(n_points)
-        x += np.random.rand(2)
-        x = x % 1
-
-    elif dist == "mpmc":
-        path = "/home/makramchahine/repos/PRM/MPMC_points/MPMC_d2_N"+str(n_points)+".npy"
-        data = np.load(path)
-        b_id, _ = get_best_batch_id(data, n_points)
-        x = data[b_id * n_points:(b_id + 1) * n_points]
-
-    elif dist == "mpmc_batch":
-        path = "/home/makramchahine/repos/PRM/MPMC_points/MPMC_d2_N"+str(n_points)+".npy"
-        data = np.load(path)
-        bs = int(data.shape[0]/n_points)
-        if rep >= bs:
-            return None
-        else:
-            x = data[rep * n_points:(rep + 1) * n_points]
-
-    elif dist == "mpmc_l2bat":
-        path = "/home/makramchahine/repos/PRM/L2_MPMC_points/MPMC_d2_N"+str(n_points)+".npy"
-        data = np.load(path)
-        bs = int(data.shape[0]/n_points)
-        if rep >= bs:
-            return None
-        else:
-            x = data[rep * n_points:(rep + 1) * n_points]
-
-    elif dist == "mpmc_rand":
-        path = "/home/makramchahine/repos/PRM/MPMC_points/MPMC_d2_N"+str(n_points)+".npy"
-        data = np.load(path)
-        b_id, _ = get_best_batch_id(data, n_points)
-        x = data[b_id * n_points:(b_id + 1) * n_points]
-
-        # add a random translation to the points
-        x += np.random.rand(2)
-        # make sure the points are still in the unit square (mod 1)
-        x = x % 1
-
-    elif dist == "mpmc_seq":
-        path = "/home/makramchahine/repos/PRM/MPMC_points/ordered_MPMC_d2_N1024.npy"
-        data = np.load(path)
-        x = data[:n_points]
-
-    elif dist == "halton_scram":
-        x = qmc.Halton(2, scramble=True).random(n_points)
-
-    elif dist =="halton_unscr":
-        x = qmc.Halton(2, scramble=False).random(n_points)
-
-    elif dist =="halton_batch":
-        halton_sampler = qmc.Halton(d=2,scramble=False)
-        halton_sampler.fast_forward(rep*n_points)
-        x = halton_sampler.random(n_points)
-    
-    elif dist =="halton_rand":
-        x = qmc.Halton(2, scramble=False).random(n_points)
-        # add a random translation to the points
-        x += np.random.rand(2)
-        # make sure the points are still in the unit square (mod 1)
-        x = x % 1
-
-    elif dist =="tri_lat":
-        # find the smallest square grid that can fit n_points
-        n_side = int(np.ceil(np.sqrt(n_points)))
-        
-        # Set y_spacing to span the full height with n_side points
-        y_spacing = 1 / n_side
-        
-        # Calculate x_spacing to maintain the sqrt(3)/2 ratio
-        x_spacing = y_spacing / (np.sqrt(3) / 2)
-        
-        # Generate grid of points
-        x = []
-        for i in range(n_side):
-            for j in range(n_side):
-                x_coord = i * x_spacing
-                y_coord = j * y_spacing
-                
-                # Shift every other row by half the x_spacing
-                if j % 2 == 1:
-                    x_coord += 0.5 * x_spacing
-                
-                # Only include points within the unit square
-                if x_coord <= 1 and y_coord <= 1:
-                    x.append([x_coord, y_coord])
-        
-        # Convert to numpy array
-        x = np.array(x)
-
-        # shift all the values up by half the spacing at the top
-        x[:,1] += (1 - max(x[:,1]))/2
-        # shift all the values to the right by half the spacing at the right
-        x[:,0] += (1 - max(x[:,0]))/2
-
-        n_generated = len(x)
-        
-        # Remove random points until we have n_points
-        while n_generated > n_points:
-            # Randomly sample points from the points generated so far
-            idx = np.random.choice(n_generated)
-            x = np.delete(x, idx, axis=0)
-            n_generated -= 1
-
-        # rotate all point by 10*pi
-        theta = 10 * np.pi / 180
-        rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
-        x = np.dot(x, rot)
-        # bring all points back to the unit square
-        x = x % 1
-
-    elif dist =="tri_lat_add":
-        # Estimate the number of points along each direction
-        n_side = int(np.floor(np.sqrt(n_points)))
-        
-        # Set y_spacing to span the full height with n_side points
-        y_spacing = 1 / n_side
-        
-        # Calculate x_spacing to maintain the sqrt(3)/2 ratio
-        x_spacing = y_spacing / (np.sqrt(3) / 2)
-        
-        # Generate grid of points
-        x = []
-        for i in range(n_side):
-            for j in range(n_side):
-                x_coord = i * x_spacing
-                y_coord = j * y_spacing
-                
-                # Shift every other row by half the x_spacing
-                if j % 2 == 1:
-                    x_coord += 0.5 * x_spacing
-                
-                # Only include points within the unit square
-                if x_coord <= 1 and y_coord <= 1:
-                    x.append([x_coord, y_coord])
-        
-        # Convert to numpy array
-        x = np.array(x)
-
-        # shift all the values up by half the spacing at the top
-        x[:,1] += (1 - max(x[:,1]))/2
-        # shift all the values to the right by half the spacing at the right
-        x[:,0] += (1 - max(x[:,0]))/2
-        
-        # Number of points generated so far
-        n_generated = len(x)
-        
-        # Generate the remaining points by taking a random sample of the points generated so far and shifting them by yspacing/2 in the y direction
-        while n_generated < n_points:
-            # Randomly sample points from the points generated so far
-            idx = np.random.choice(n_generated)
-            # plus min
-            pmy = np.random.choice([-1,1])
-            # Shift the sampled point by sqrt(3)/4 in the y direction
-            new_point = x[idx] + np.array([0, pmy * 2* y_spacing/3])
-            # Only include the new point if it is within the unit square and not already in the list
-            if new_point[0] <= 1 and new_point[1] <= 1 and new_point[0] >= 0 and new_point[1] >= 0:
-                if not any(np.all(np.isclose(new_point, x), axis=1)):
-                    x = np.vstack((x, new_point))
-                    n_generated += 1
-        
-        # rotate all point by 10*pi
-        theta = 10 * np.pi / 180
-        rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
-        x = np.dot(x, rot)
-        # bring all points back to the unit square
-        x = x % 1
-
-    elif dist == "sukharev_add":
-        # make a grid of points
-        n = int(np.sqrt(n_points))
-        x = np.array([[i/n, j/n] for i in range(n) for j in range(n)])
-        # shift by half the spacing in the x direction
-        x[:,0] += 1/(2*n)
-        # shift by half the spacing in the y direction
-        x[:,1] += 1/(2*n)
-
-        # add the remaining points by taking a random sample of the points generated so far and shifting them by yspacing/2 in the y direction
-        while len(x) < n_points:
-            idx = np.random.choice(len(x))
-            pmx = np.random.choice([-1,1])
-            pmy = np.random.choice([-1,1])
-            new_point = x[idx] + np.array([pmx, pmy]) * 1/(2*n)
-            if new_point[0] < 1 and new_point[1] < 1 and new_point[0] > 0 and new_point[1] > 0:
-                if not any(np.all(np.isclose(new_point, x), axis=1)):
-                    x = np.vstack((x, new_point))
-        
-        # rotate all point by 10*pi
-        theta = 10 * np.pi / 180 
-        rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
-        x = np.dot(x, rot)
-        # bring all points back to the unit square
-        x = x % 1
-
-    elif dist == "sukharev":
-        # find the smallest square grid that can fit n_points
-        n = np.ceil(np.sqrt(n_points))
-        # generate the grid
-        x = np.array([[i/n, j/n] for i in range(int(n)) for j in range(int(n))])
-        # shift by half the spacing in the x direction
-        x[:,0] += 1/(2*n)
-        # shift by half the spacing in the y direction
-        x[:,1] += 1/(2*n)
-
-        # remove random points until we have n_points
-        while len(x) > n_points:
-            idx = np.random.choice(len(x))
-            x = np.delete(x, idx, axis=0)
-
-        # rotate all point by 10*pi/180
-        theta = 10 * np.pi /180
-        rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
-        x = np.dot(x, rot)
-        # bring all points back to the unit square
-        x = x % 1
-
-    else:
+    if dist not in BATCH_SAMPLERS:
         raise ValueError(f"Invalid distribution: {dist}")
-    
-    return x
+
+    x = BATCH_SAMPLERS[dist](dist, n_points, reps, rng, start)
+    if x is None or len(x) == 0:
+        return None
+    return np.ascontiguousarray(x, dtype=dtype)
+
+@register("uniform")
+def uniform_batch(dist, n_points, reps, rng, start):
+    rng = np.random if rng is None else rng
+    return rng.random((reps, n_points, 2))
+
+@register("sobol_unscr", "halton_unscr", "mpmc", "mpmc_seq")
+def deterministic_batch(dist, n_points, reps, rng, start):
+    # Every rep of a deterministic point set is the same
+    return np.repeat(base_points(dist, n_points)[None], reps, axis=0)
+
+@register("sobol_rand", "halton_rand", "mpmc_rand")
+def shifted_batch(dist, n_points, reps, rng, start):
+    # One random translation per rep of the deterministic point set, in its dtype
+    rng = np.random if rng is None else rng
+    base = {"sobol_rand": "sobol_unscr", "halton_rand": "halton_unscr", "mpmc_rand": "mpmc"}[dist]
+    x = np.repeat(base_points(base, n_points)[None], reps, axis=0)
+    x += rng.random((reps, 1, 2))
+    return x % 1
+
+@register("sobol_scram", "halton_scram")
+def scrambled_batch(dist, n_points, reps, rng, start):
+    # Every rep is a new scrambling of the sequence, seeded from rng
+    from scipy.stats import qmc
+
+    engine = qmc.Sobol if dist == "sobol_scram" else qmc.Halton
+    return np.stack([engine(2, scramble=True, seed=rng).random(n_points) for _ in range(reps)])
+
+@register("sobol_batch", "halton_batch")
+def sequence_batch(dist, n_points, reps, rng, start):
+    return qmc_batch(dist, n_points, start, reps).reshape(reps, n_points, 2)
+
+@register("mpmc_batch", "mpmc_l2bat")
+def stored_batch(dist, n_points, reps, rng, start):
+    # A single slice of the memory-mapped batches, without copying
+    family = "mpmc" if dist == "mpmc_batch" else "l2"
+    stop = min(start + reps, pointsets.store.n_batches(family, n_points))
+    data = pointsets.store.array(family, n_points)
+    return data[start * n_points:max(start, stop) * n_points].reshape(-1, n_points, 2)
+
+@register("tri_lat", "sukharev")
+def trimmed_batch(dist, n_points, reps, rng, start):
+    # The n_points smallest of a random key per lattice point form a uniform
+    # random subset, kept in lattice order, for all reps at once
+    rng = np.random if rng is None else rng
+    x = lattice(dist, n_points)
+    if len(x) <= n_points:
+        return rotate(np.repeat(x[None], reps, axis=0))
+    keep = np.sort(np.argsort(rng.random((reps, len(x))), axis=1)[:, :n_points], axis=1)
+    return rotate(x[keep])
+
+@register("tri_lat_add", "sukharev_add")
+def grown_batch(dist, n_points, reps, rng, start):
+    rng = np.random if rng is None else rng
+    return rotate(np.stack([grow(dist, n_points, rng) for _ in range(reps)]))
 
 
 # # List of distributions and number of nodes
@@ -363,9 +388,12 @@ def sampler(n_points = 32, dist = "uniform", rep=0):
 # plt.axis('equal')
 # plt.savefig("mpmc_batch.png")
 
-# plot the halton_batch distribution with different rep seeds
-for rep in range(3):
-    x = sampler(n_points=16, dist="sobol_batch", rep=rep)
-    plt.scatter(x[:, 0], x[:, 1], s=10)
-plt.axis('equal')
-plt.savefig("halton_batch.png")
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
+    # plot the halton_batch distribution with different rep seeds
+    for rep in range(3):
+        x = sampler(n_points=16, dist="sobol_batch", rep=rep)
+        plt.scatter(x[:, 0], x[:, 1], s=10)
+    plt.axis('equal')
+    plt.savefig("halton_batch.png")
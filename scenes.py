@@ -0,0 +1,277 @@
+# Registry of the planning levels, loaded from the JSON scene files of the
+# scenes directory. Nothing is built or read until a scene is asked for.
+
+import json
+import os
+
+import numpy as np
+
+import collision
+import graph
+
+SCENES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenes')
+
+# Scenes already loaded, per file
+_scenes = {}
+
+# Level contexts already built, per level, robot radius and collision method
+_contexts = {}
+
+
+class Scene:
+    '''
+    A level: the map size, the start and goal of the robot and the obstacles.
+
+    A scene can stand in for an environment.Environment whose obstacles are
+    made, e.g. for the render module.
+
+    Attributes
+    ----------
+    level : int
+        Difficulty level of the scene.
+    map_dimensions : tuple
+        Map width and height in pixels.
+    start : tuple
+        Initial position in X and Y respectively.
+    goal : tuple
+        End position in X and Y respectively.
+    obstacles : list
+        Sides of the obstacles as (left, top, width, height) tuples.
+    '''
+
+    def __init__(self, level, map_dimensions, start, goal, obstacles):
+        self.level = level
+        (self.WIDTH, self.HEIGHT) = map_dimensions
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.obstacles = [tuple(int(value) for value in side) for side in obstacles]
+        self._boxes = None
+
+    @classmethod
+    def from_environment(cls, environment, start, goal):
+        '''Scene of an environment.Environment whose obstacles are made.'''
+        return cls(environment.level, (environment.WIDTH, environment.HEIGHT), start, goal,
+                   environment.obstacle_rects())
+
+    @classmethod
+    def load(cls, file):
+        '''Reads a scene from a JSON file, see save.'''
+        with open(file) as f:
+            content = json.load(f)
+        return cls(content['level'], content['map_dimensions'], content['start'], content['goal'],
+                   content['obstacles'])
+
+    def save(self, file):
+        '''Writes the scene as a JSON file.'''
+        content = {'level': self.level, 'map_dimensions': list(self.map_dimensions), 'start': list(self.start),
+                   'goal': list(self.goal), 'obstacles': [list(side) for side in self.obstacles]}
+        with open(file, 'w') as f:
+            json.dump(content, f)
+            f.write('\n')
+
+    @property
+    def map_dimensions(self):
+        return self.WIDTH, self.HEIGHT
+
+    def obstacle_rects(self):
+        '''Each side of the obstacles as a flat list of (left, top, width, height) tuples.'''
+        return list(self.obstacles)
+
+    @property
+    def boxes(self):
+        '''Obstacle bounds of shape (m, 4), compiled on first use, see collision.rects_to_array.'''
+        if self._boxes is None:
+            self._boxes = collision.rects_to_array(self.obstacles)
+        return self._boxes
+
+    def collision_checker(self, radius, method='analytic'):
+        '''
+        Compiled obstacles of the scene for a robot radius, shared by every caller.
+
+        Parameters
+        ----------
+        radius : int
+            Robot radius.
+        method : str
+            'analytic' for the obstacle grid, 'bitmap' for the occupancy
+            bitmap, see graph.Graph.
+
+        Returns
+        -------
+        collision.ObstacleGrid or collision.OccupancyBitmap
+        '''
+        return _compiled(self.boxes, radius, self.map_dimensions, method)
+
+
+class LevelContext:
+    '''
+    What every rep and sampler on a level shares for a robot radius.
+
+    The obstacles are compiled once, and the start and goal are checked
+    once, so a rep only maps its samples, filters them and builds its
+    roadmap.
+
+    Attributes
+    ----------
+    scene : Scene
+        Level the context is built for.
+    radius : int
+        Robot radius.
+    collision : str
+        'analytic' or 'bitmap' collision checks, see graph.Graph.
+    obstacles : list
+        Sides of the obstacles, empty for a map without obstacles.
+    start_free, goal_free : bool
+        Whether the robot overlaps no obstacle at the start and at the goal.
+    '''
+
+    def __init__(self, scene, radius, collision='analytic', obstacles=True):
+        self.scene = scene
+        self.radius = radius
+        self.collision = collision
+        self.obstacles = scene.obstacle_rects() if obstacles else []
+        self.boxes = scene.boxes if obstacles else np.empty((0, 4))
+        self.obstacle_grid = _compiled(self.boxes, radius, scene.map_dimensions, 'analytic')
+        self.collision_checker = _compiled(self.boxes, radius, scene.map_dimensions, collision)
+        self.start_free, self.goal_free = (~self.collision_checker.points_collide([scene.start, scene.goal])).tolist()
+
+    def endpoints_free(self, start, goal):
+        '''
+        Whether the robot overlaps no obstacle at both start and goal.
+
+        The start and goal of the scene were checked when the context was
+        built, any other ones are checked now.
+
+        Returns
+        -------
+        bool
+        '''
+        if (tuple(start), tuple(goal)) == (self.scene.start, self.scene.goal):
+            return self.start_free and self.goal_free
+        return not self.collision_checker.points_collide([start, goal]).any()
+
+    def graph(self, start=None, goal=None, **options):
+        '''
+        Graph on the map of the level with the compiled obstacles.
+
+        Parameters
+        ----------
+        start, goal : tuple
+            Initial and end positions, the ones of the scene by default.
+        **options
+            Other graph.Graph options, the radius and collision method are
+            the ones of the context.
+
+        Returns
+        -------
+        graph.Graph
+        '''
+        graph_ = graph.Graph(start=self.scene.start if start is None else start,
+                             goal=self.scene.goal if goal is None else goal, map_dimensions=self.scene.map_dimensions,
+                             radius=self.radius, collision=self.collision, **options)
+        graph_.use_obstacles(self.obstacles, self.boxes, self.obstacle_grid, self.collision_checker)
+        return graph_
+
+    def free_configurations(self, points):
+        '''
+        Robot centers of samples of the unit square that overlap no obstacle.
+
+        The same nodes, in the same order, as graph.Graph.generate_input_nodes
+        followed by graph.Graph.is_free on every sample, in one batch.
+
+        Parameters
+        ----------
+        points : numpy.ndarray
+            Samples of shape (n, 2).
+
+        Returns
+        -------
+        list
+            Free robot centers as tuples of ints.
+        '''
+        points = np.asarray(points)
+        if len(points) == 0:
+            return []
+        # Scaled in the dtype of the samples and truncated, like int(unit_pt[0] * WIDTH)
+        centers = np.stack([points[:, 0] * self.scene.WIDTH, points[:, 1] * self.scene.HEIGHT],
+                           axis=1).astype(np.int64)
+        free = ~self.collision_checker.points_collide(centers)
+        return list(map(tuple, centers[free].tolist()))
+
+
+def _compiled(boxes, radius, map_dimensions, method):
+    # Shared obstacle grid or occupancy bitmap of obstacle bounds
+    if method == 'bitmap':
+        return collision.occupancy_bitmap(boxes, radius, map_dimensions)
+    return collision.obstacle_grid(boxes, radius, map_dimensions)
+
+
+def scene_file(level, directory=SCENES_DIR):
+    '''Path of the scene file of a level.'''
+    return os.path.join(directory, 'level_' + str(level) + '.json')
+
+
+def load_scene(level, directory=SCENES_DIR):
+    '''
+    Scene of a level, read once and then shared.
+
+    Parameters
+    ----------
+    level : int
+        Difficulty level of the environment.
+    directory : str
+        Directory of the scene files.
+
+    Returns
+    -------
+    Scene
+    '''
+    file = scene_file(level, directory)
+    if file not in _scenes:
+        _scenes[file] = Scene.load(file)
+    return _scenes[file]
+
+
+def level_context(level, radius, collision='analytic', obstacles=True, directory=SCENES_DIR):
+    '''
+    Context of a level and robot radius, built once per process and then shared.
+
+    Parameters
+    ----------
+    level : int
+        Difficulty level of the environment.
+    radius : int
+        Robot radius.
+    collision : str
+        'analytic' or 'bitmap' collision checks, see graph.Graph.
+    obstacles : bool
+        Whether the obstacles of the level are on the map.
+    directory : str
+        Directory of the scene files.
+
+    Returns
+    -------
+    LevelContext
+    '''
+    key = (scene_file(level, directory), radius, collision, bool(obstacles))
+    if key not in _contexts:
+        _contexts[key] = LevelContext(load_scene(level, directory), radius, collision, obstacles)
+    return _contexts[key]
+
+
+def export_levels(levels=range(4), directory=SCENES_DIR):
+    '''Writes the scene files of the levels built by environment.Environment.'''
+    import environment
+    from config import MAP_DIMENSIONS, INITIAL
+
+    os.makedirs(directory, exist_ok=True)
+    for level in levels:
+        environment_ = environment.Environment(map_dimensions=MAP_DIMENSIONS, level=level)
+        environment_.make_obstacles()
+        scene = Scene.from_environment(environment_, INITIAL[level]['start'], INITIAL[level]['goal'])
+        scene.save(scene_file(level, directory))
+        print(f'Level {level} saved to {scene_file(level, directory)}')
+
+
+if __name__ == '__main__':
+    export_levels()
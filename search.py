@@ -0,0 +1,175 @@
+# Shortest path searches over the array-backed Roadmap.
+
+import heapq
+import math
+
+import numpy as np
+
+
+def reconstruct(came_from, node):
+    '''
+    Follows the predecessors back from the given node.
+
+    Parameters
+    ----------
+    came_from : list
+        Predecessor of every node, -1 where there is none.
+    node : int
+        Last node of the path.
+
+    Returns
+    -------
+    list
+        Node indices from the first node of the path to the given one.
+    '''
+    path = [node]
+    while came_from[node] != -1:
+        node = came_from[node]
+        path.append(node)
+
+    return path[::-1]
+
+
+def a_star(roadmap, start, goals, target, edge_free):
+    '''
+    A* search on node indices with a binary heap and lazy deletion.
+
+    Improved nodes are pushed again instead of being updated in place, and
+    outdated heap entries are skipped when popped. Nodes are expanded again
+    when reached with a lower cost, so the search stays correct with the
+    integer truncated heuristic. The work done only depends on the nodes
+    reached, not on the size of the roadmap.
+
+    Parameters
+    ----------
+    roadmap : Roadmap
+        Roadmap to search.
+    start : int
+        Start node.
+    goals : set
+        Nodes that end the search.
+    target : tuple
+        Point the heuristic measures the distance to.
+    edge_free : callable
+        Called with an undirected edge id, returns whether it is collision free.
+
+    Returns
+    -------
+    tuple
+        Node indices from start to the reached goal, or None when no goal is
+        reachable, and a dict of expansion statistics.
+    '''
+    indptr, indices, weights, edge_ids, coordinates = roadmap.as_lists()
+    tx, ty = target
+
+    def heuristic(node):
+        x, y = coordinates[node]
+        return math.floor(math.sqrt((x - tx)**2 + (y - ty)**2))
+
+    g_score = [math.inf] * roadmap.n_nodes
+    came_from = [-1] * roadmap.n_nodes
+    g_score[start] = 0
+    open_set = [(heuristic(start), 0, start)] # (f-score, g-score, node)
+    stats = {'expanded': 0, 'pushed': 1, 'stale': 0, 'relaxed': 0}
+
+    while open_set:
+        _, g, current = heapq.heappop(open_set)
+
+        # A cheaper entry of the node has already been handled
+        if g > g_score[current]:
+            stats['stale'] += 1
+            continue
+
+        if current in goals:
+            return reconstruct(came_from, current), stats
+
+        stats['expanded'] += 1
+        for edge in range(indptr[current], indptr[current + 1]):
+            neighbor = indices[edge]
+            temp_g_score = g + weights[edge]
+
+            if temp_g_score < g_score[neighbor] and edge_free(edge_ids[edge]):
+                came_from[neighbor] = current
+                g_score[neighbor] = temp_g_score
+                heapq.heappush(open_set, (temp_g_score + heuristic(neighbor), temp_g_score, neighbor))
+                stats['relaxed'] += 1
+                stats['pushed'] += 1
+
+    return None, stats
+
+
+def dijkstra(indptr, indices, weights, sources):
+    '''
+    Multi-source Dijkstra search over list-based CSR adjacency.
+
+    Parameters
+    ----------
+    indptr : list
+        CSR offsets of the adjacency.
+    indices : list
+        Target node of every edge.
+    weights : list
+        Length of every edge.
+    sources : dict
+        Initial cost of every source node.
+
+    Returns
+    -------
+    tuple
+        Distance and predecessor of every node, inf and -1 where the node
+        is not reachable. Sources have no predecessor.
+    '''
+    distances = [math.inf] * (len(indptr) - 1)
+    came_from = [-1] * (len(indptr) - 1)
+    open_set = []
+    for node, cost in sources.items():
+        if cost < distances[node]:
+            distances[node] = cost
+            heapq.heappush(open_set, (cost, node))
+
+    while open_set:
+        distance, current = heapq.heappop(open_set)
+        if distance > distances[current]:
+            continue
+
+        for edge in range(indptr[current], indptr[current + 1]):
+            neighbor = indices[edge]
+            temp_distance = distance + weights[edge]
+            if temp_distance < distances[neighbor]:
+                distances[neighbor] = temp_distance
+                came_from[neighbor] = current
+                heapq.heappush(open_set, (temp_distance, neighbor))
+
+    return distances, came_from
+
+
+def csgraph_shortest_paths(roadmap, sources):
+    '''
+    Shortest paths from a set of sources to every node in one scipy call.
+
+    The roadmap edges known to be collision free are exported as a
+    scipy.sparse CSR matrix and searched with csgraph Dijkstra. Edges of
+    zero length between nodes at the same center are stored explicitly in
+    the matrix, which csgraph keeps as edges.
+
+    Parameters
+    ----------
+    roadmap : Roadmap
+        Roadmap to search, unchecked edges count as blocked.
+    sources : list
+        Start nodes.
+
+    Returns
+    -------
+    tuple
+        Distance of every node from its nearest source, inf where it is not
+        reachable, predecessor of every node on that path, -1 where there
+        is none, and the source the path starts from.
+    '''
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+
+    distances, predecessors, origins = csgraph_dijkstra(roadmap.to_csr(valid_only=True), directed=True,
+                                                        indices=sources, return_predecessors=True,
+                                                        min_only=True)
+    predecessors = np.where(predecessors < 0, -1, predecessors)
+    return distances, predecessors, origins
@@ -0,0 +1,244 @@
+# Parallel sweep of prm_vs_samplers over the (level, nodes, sampler, radius,
+# k, rep) grid. Every task draws from its own random stream, derived from the
+# root seed and its grid cell, so the results do not depend on the number of
+# workers. Finished tasks are saved to the results store as the sweep goes,
+# and --resume only runs the ones missing from it, and the failed ones with
+# --retry_errors. Options not listed below are passed on to prm_vs_samplers,
+# e.g.
+#
+#   python sweep.py --levels 1 2 --nodes 32 64 128 --radius 6 --reps 50 -s --resume --obstacles
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+import prm_vs_samplers
+import results_store
+import scenes
+from sampler import sample_batch
+from config import SAMPLERS, DETERMINISTIC_SAMPLERS, MPMC_SAMPLERS, MPMC_NODES
+
+
+def make_tasks(levels, node_counts, samplers, radii, ks, reps):
+    '''
+    Expands the sweep into one task per run.
+
+    Deterministic samplers are run once and the MPMC samplers only for the
+    node counts they have point sets for, as in prm_vs_samplers.main.
+
+    Returns
+    -------
+    list
+        (level, nodes, sampler, radius, k, rep) tuples, in the order the
+        results are gathered.
+    '''
+    tasks = []
+    for level in levels:
+        for nodes in node_counts:
+            for distribution in samplers:
+                if distribution in MPMC_SAMPLERS and nodes not in MPMC_NODES:
+                    print(f'{distribution} cannot be run with {nodes} nodes')
+                    continue
+                reps_ = 1 if distribution in DETERMINISTIC_SAMPLERS else reps
+                for radius in radii:
+                    for k in ks:
+                        tasks.extend((level, nodes, distribution, radius, k, rep) for rep in range(reps_))
+    return tasks
+
+
+def task_seed(root_seed, task):
+    '''Seed sequence of the random stream of a task, the same whatever runs it.'''
+    level, nodes, distribution, radius, k, rep = task
+    return np.random.SeedSequence(root_seed, spawn_key=(level, nodes, SAMPLERS.index(distribution), radius, k, rep))
+
+
+def init_worker(base_args):
+    # Planner options shared by every task of the sweep
+    prm_vs_samplers.args = base_args
+
+
+def run_task(task, root_seed):
+    '''
+    Runs the queries of one rep of a sampler in a grid cell.
+
+    Returns
+    -------
+    tuple
+        Outcomes of the queries, as returned by prm_vs_samplers.run_prm_iteration,
+        and the seconds the task took.
+    '''
+    level, nodes, distribution, radius, k, rep = task
+    args = copy.copy(prm_vs_samplers.args)
+    args.level, args.nodes, args.radius, args.k_nearest = level, nodes, radius, k
+    prm_vs_samplers.args = args
+
+    # The points and any other draw of the task come from its own stream
+    sequence = task_seed(root_seed, task)
+    rng = np.random.default_rng(sequence)
+    np.random.seed(sequence.generate_state(4))
+    random.seed(int(sequence.generate_state(1)[0]))
+
+    scene = scenes.load_scene(level)
+    x_init, x_goal = [scene.start], [scene.goal]
+    start = time.perf_counter()
+    try:
+        # Samplers without the batch of this rep report their batch size
+        points = sample_batch(distribution, nodes, 1, rng=rng, start=rep, dtype=None)
+        points = points[0] if points is not None else None
+        if args.multi_query:
+            outcomes = prm_vs_samplers.run_multi_query_iteration(distribution, x_init, x_goal, level, rep, points)
+        else:
+            outcomes = [prm_vs_samplers.run_prm_iteration(distribution, x_init[i], x_goal[i], level, rep, points)
+                        for i in range(len(x_init))]
+    except Exception:
+        outcomes = [(None, None, None, None, None)] * len(x_init)
+    return outcomes, time.perf_counter() - start
+
+
+def task_rows(task, outcomes, seconds, base_args, root_seed):
+    '''
+    Rows of the results store of the outcomes of a task, see
+    prm_vs_samplers.outcome_row.
+
+    A task without points only leaves the row of its batch size.
+    '''
+    level, nodes, distribution, radius, k, rep = task
+    args = copy.copy(base_args)
+    args.radius, args.k_nearest = radius, k
+    prm_vs_samplers.args = args
+
+    scene = scenes.load_scene(level)
+    if outcomes[0][3]:
+        outcomes = outcomes[:1]
+    rows = [prm_vs_samplers.outcome_row(distribution, level, nodes, rep, i, outcome, scene.start, scene.goal,
+                                        seconds) for i, outcome in enumerate(outcomes)]
+    for row in rows:
+        row['seed'] = root_seed
+    return rows
+
+
+def completed_tasks(tasks, base_args, root_seed):
+    '''
+    Tasks whose rows are already in the results store.
+
+    A task is complete when the store holds a row of it for the same
+    planner options, see results_store.run_options, and root seed. Tasks
+    that failed are complete as well, running them again usually fails the
+    same way, see --retry_errors.
+
+    Returns
+    -------
+    tuple
+        Sets of the complete tasks and of the ones among them that failed,
+        as (level, nodes, sampler, radius, k, rep) tuples.
+    '''
+    if not tasks:
+        return set(), set()
+    columns = ['level', 'nodes', 'sampler', 'radius', 'k', 'rep']
+    rows = results_store.store.read(columns + ['verdict'], level=sorted({task[0] for task in tasks}),
+                                    nodes=sorted({task[1] for task in tasks}), seed=root_seed,
+                                    **results_store.run_options(base_args))
+    stored = set(zip(*(rows[column].tolist() for column in columns)))
+    failed = rows['verdict'] == 'error'
+    errors = set(zip(*(rows[column][failed].tolist() for column in columns)))
+    return {task for task in tasks if task in stored}, {task for task in tasks if task in errors}
+
+
+def pending_summary(tasks):
+    # Number of pending reps of every sampler in every grid cell
+    summary = {}
+    for level, nodes, distribution, radius, k, rep in tasks:
+        cell = (level, nodes, distribution, radius, k)
+        summary[cell] = summary.get(cell, 0) + 1
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs prm_vs_samplers over a grid of settings in parallel.')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1], help='Difficulty levels of the environment')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[32], help='Numbers of nodes of the roadmap')
+    parser.add_argument('--samplers', type=str, nargs='+', choices=SAMPLERS, default=['mpmc_l2bat'],
+                        help='Samplers to compare')
+    parser.add_argument('--radius', type=int, nargs='+', default=[10], help='Robot radii')
+    parser.add_argument('--k', type=int, nargs='+', default=[15],
+                        help='Numbers of the closest neighbors to examine for each configuration')
+    parser.add_argument('--reps', type=int, default=20, help='Number of repetitions for each randomized sampler')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='Root seed of the random streams of the tasks')
+    parser.add_argument('-s', '--save', type=bool, action=argparse.BooleanOptionalAction, default=False,
+                        help='Append the results to the results store')
+    parser.add_argument('--resume', type=bool, action=argparse.BooleanOptionalAction, default=False,
+                        help='Only run the tasks whose results are not in the results store yet')
+    parser.add_argument('--retry_errors', '--retry-errors', action='store_true',
+                        help='Also run again the stored tasks that failed')
+    parser.add_argument('--dry_run', '--dry-run', action='store_true',
+                        help='List the pending tasks without running them')
+    parser.add_argument('--checkpoint', type=float, default=5,
+                        help='Seconds between two saves of the finished tasks, 0 to save every task')
+    args, planner_options = parser.parse_known_args()
+    base_args = prm_vs_samplers.check_options(prm_vs_samplers.parser.parse_args(planner_options))
+    base_args.reps = args.reps
+
+    tasks = make_tasks(args.levels, args.nodes, args.samplers, args.radius, args.k, args.reps)
+    failed = set()
+    if args.resume or not base_args.overwrite:
+        done, failed = completed_tasks(tasks, base_args, args.seed)
+        print(f'{len(done)} of {len(tasks)} runs already in {results_store.store.root}, {len(failed)} of them failed')
+        if args.retry_errors:
+            done -= failed
+        tasks = [task for task in tasks if task not in done]
+
+    if args.dry_run:
+        for (level, nodes, distribution, radius, k), reps in pending_summary(tasks).items():
+            print(f'{distribution} at level {level}, nodes {nodes}, radius {radius}, k {k}: {reps} reps pending')
+        if not args.retry_errors:
+            for (level, nodes, distribution, radius, k), reps in pending_summary(sorted(failed)).items():
+                print(f'{distribution} at level {level}, nodes {nodes}, radius {radius}, k {k}: {reps} reps failed, '
+                      f'see --retry_errors')
+        print(f'{len(tasks)} runs pending')
+        sys.exit()
+
+    print(f'{len(tasks)} runs on {args.workers} workers')
+
+    # Finished tasks are saved as they come, a sweep that stops only loses
+    # the ones since the last checkpoint
+    rows = {}
+    unsaved = []
+    saved = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(base_args,)) as executor:
+        futures = {executor.submit(run_task, task, args.seed): task for task in tasks}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            task = futures[future]
+            outcomes, seconds = future.result()
+            rows[task] = task_rows(task, outcomes, seconds, base_args, args.seed)
+            if args.save:
+                unsaved.extend(rows[task])
+                if time.perf_counter() - saved >= args.checkpoint:
+                    results_store.store.append(unsaved)
+                    unsaved, saved = [], time.perf_counter()
+    if args.save:
+        results_store.store.append(unsaved)
+        print(f'Results of {len(tasks)} runs saved to {results_store.store.root}')
+
+    summary = {}
+    for task in tasks:
+        for row in rows[task]:
+            cell = (row['sampler'], row['level'], row['nodes'], row['radius'], row['k'])
+            successes, queries = summary.get(cell, (0, 0))
+            summary[cell] = (successes + row.get('success', False), queries + (row['verdict'] != 'exhausted'))
+    for (distribution, level, nodes, radius, k), (successes, queries) in summary.items():
+        print(f'{distribution} at level {level}, nodes {nodes}, radius {radius}, k {k}: '
+              f'{successes}/{queries} successes')
+
+    sys.exit()
+
+
+if __name__ == '__main__':
+    main()